@@ -1,21 +1,74 @@
+import math
 import os
-from flask import Flask, request, redirect, url_for, flash, jsonify
-from models import db, Phone, ListingLog
+from flask import Flask, Response, request, redirect, url_for, flash, jsonify, stream_with_context
+from models import db, Phone, PhonePrice, ensure_columns, ensure_indexes
 from forms import PhoneForm
-from utils import import_phones_from_csv, sanitize_string
-from platform_mock import simulate_listing
-from pricing import calculate_platform_price, map_condition_for_platform
+from utils import run_import, import_phones_job, sanitize_string, DEFAULT_BATCH_SIZE, DUPLICATE_SKU_ERROR
+from listing import list_phone_on_platform, list_phone_job, list_phones_batch, list_phones_batch_job
+from jobs import init_jobs, submit_job, get_job, spool_upload
+from dispatcher import init_dispatcher, listing_dispatcher
+from pricing import calculate_platform_price, map_condition_for_platform, PLATFORM_FEES
+from platforms import registry
+from stats import get_stats, DEFAULT_LOW_STOCK_THRESHOLD, MAX_LOW_STOCK_THRESHOLD
+from log_retention import (archive_logs, archive_logs_job, delete_phone_logs, daily_log_summary,
+                           DEFAULT_RETENTION_DAYS, DEFAULT_RETENTION_BATCH, DEFAULT_SUMMARY_LIMIT)
+from stock import phone_allocations, release_stock, delete_allocations
+from cache import init_cache, read_cache, request_cache_key
+from metrics import init_metrics, metrics_response
+from http_cache import catalog_response, catalog_version, phone_response, price_response
+from serializers import iter_phone_dicts, iter_log_dicts, serialize_rows
+from exports import phone_export_query, log_export_query, export_response
+from listing_logs import wants_log_pagination, newest_logs, paginate_logs
+from price_matrix import (load_pricing_rows, build_price_matrix, persist_price_matrix,
+                          refresh_phone_prices, refresh_missing_prices, refresh_outdated_prices,
+                          delete_phone_prices, attach_prices, lookup_prices)
+from catalog import apply_phone_filters, paginate_phones, wants_pagination, parse_limit
+from database import (DEFAULT_SQLITE_BUSY_TIMEOUT_MS, database_url_from_env,
+                      engine_options_from_env, configure_sqlite)
+from changes import (init_change_log, changes_since, change_stream, latest_seq,
+                     DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT)
+from search import init_search_index, search_enabled, search_phones
+from tags import init_tag_index, tag_counts
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy.exc import IntegrityError
 from functools import wraps
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+MAX_BATCH_LISTING_PHONES = 10000
+MAX_BULK_PRICE_PHONES = 5000
+CHANGE_STREAM_SECONDS = 300
+MAX_TAG_COUNTS = 1000
 
-def create_app():
+
+def is_admin_request():
+    return request.args.get("admin") == "1" or request.headers.get("X-ADMIN") == "1"
+
+
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY") or "dev-secret-key"
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(basedir, "phone_inventory.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url_from_env(
+        "sqlite:///" + os.path.join(basedir, "phone_inventory.db"))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS") or DEFAULT_SQLITE_BUSY_TIMEOUT_MS)
+    app.config["SQLITE_PRAGMAS"] = None
+    app.config["PLATFORMS_FILE"] = os.environ.get("PLATFORMS_FILE")
+    app.config["PLATFORM_API_URL"] = os.environ.get("PLATFORM_API_URL")
+    app.config["STATS_TTL"] = 30
+    app.config["LOG_RETENTION_DAYS"] = int(os.environ.get("LOG_RETENTION_DAYS") or DEFAULT_RETENTION_DAYS)
+    app.config["LOG_RETENTION_BATCH"] = int(os.environ.get("LOG_RETENTION_BATCH") or DEFAULT_RETENTION_BATCH)
+    app.config["LOG_ARCHIVE_DIR"] = os.environ.get("LOG_ARCHIVE_DIR")
+    app.config["SLOW_QUERY_MS"] = int(os.environ.get("SLOW_QUERY_MS") or 200)
+    app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND") or "memory"
+    app.config["CACHE_REDIS_URL"] = os.environ.get("CACHE_REDIS_URL")
+    app.config["CACHE_TTL"] = int(os.environ.get("CACHE_TTL") or 60)
+    app.config["CACHE_MAX_ENTRIES"] = int(os.environ.get("CACHE_MAX_ENTRIES") or 2048)
+    if test_config:
+        app.config.update(test_config)
+    if app.config["PLATFORMS_FILE"]:
+        registry.load_file(app.config["PLATFORMS_FILE"])
 
     db.init_app(app)
     csrf = CSRFProtect(app)
@@ -36,13 +89,29 @@ def create_app():
         return response
 
     with app.app_context():
+        configure_sqlite(db.engine, app.config["SQLITE_BUSY_TIMEOUT_MS"], app.config["SQLITE_PRAGMAS"])
         db.create_all()
+        ensure_columns()
+        # upserts match on the SKU and need the index to keep concurrent imports from
+        # inserting the same phone twice
+        app.config["UPSERT_IMPORTS"] = "uq_phones_sku" not in ensure_indexes()
+        app.config["SEARCH_FTS"] = init_search_index()
+        app.config["CHANGE_FEED"] = init_change_log()
+        app.config["TAG_INDEX"] = init_tag_index()
+        refresh_missing_prices()
+        # PLATFORMS_FILE may have changed fees or labels since the prices were stored
+        refresh_outdated_prices()
+        db.session.commit()
+    init_jobs(app)
+    init_dispatcher(app)
+    init_cache(app)
+    with app.app_context():
+        metrics = init_metrics(app, db.engine, is_admin_request)
 
     def admin_required(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            is_admin = request.args.get("admin") == "1" or request.headers.get("X-ADMIN") == "1"
-            if not is_admin:
+            if not is_admin_request():
                 if request.path.startswith("/api/"):
                     return jsonify({"error": "Admin access required"}), 403
                 flash("Admin access required (append ?admin=1)", "warning")
@@ -50,27 +119,53 @@ def create_app():
             return f(*args, **kwargs)
         return decorated
 
+    def build_phone_listing(default_order):
+        with_prices = request.args.get("prices") == "1"
+        if wants_pagination(request.args):
+            try:
+                page = paginate_phones(request.args, default_order=default_order)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if with_prices:
+                attach_prices(page["items"])
+            return jsonify(page)
+
+        order = Phone.id.desc() if default_order == "desc" else Phone.id.asc()
+        try:
+            query = apply_phone_filters(Phone.query, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        items = iter_phone_dicts(query.order_by(order))
+        if with_prices:
+            items = attach_prices(list(items))
+        return serialize_rows(items)
+
+    def phone_listing(default_order="asc"):
+        return catalog_response(lambda: build_phone_listing(default_order))
+
     @app.route("/")
     def index():
+        return phone_listing()
+
+    @app.route("/api/search", methods=["GET"])
+    def api_search():
         q = sanitize_string(request.args.get("q") or "")
         cond = sanitize_string(request.args.get("condition") or "")
-
-        phones = Phone.query
-        if q:
-            phones = phones.filter(
-                (Phone.model_name.ilike(f"%{q}%")) | (Phone.brand.ilike(f"%{q}%"))
-            )
-        if cond:
-            phones = phones.filter_by(condition=cond)
-        phones = phones.all()
-
-        return jsonify([phone.to_dict() for phone in phones])
+        if not q:
+            return jsonify({"error": "Missing search query"}), 400
+        if not search_enabled():
+            return jsonify({"error": "Full-text search is not available"}), 501
+        try:
+            limit = parse_limit(request.args.get("limit"), default=20)
+            offset = max(0, int(request.args.get("offset") or 0))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(search_phones(q, condition=cond, limit=limit, offset=offset))
 
     @app.route("/admin")
     @admin_required
     def admin():
-        phones = Phone.query.order_by(Phone.id.desc()).all()
-        return jsonify([phone.to_dict() for phone in phones])
+        return phone_listing(default_order="desc")
 
     @app.route("/phone/add", methods=["POST"])
     @admin_required
@@ -89,7 +184,13 @@ def create_app():
                 tags=form.tags.data.strip()
             )
             db.session.add(phone)
-            db.session.commit()
+            try:
+                db.session.flush()
+                refresh_phone_prices([phone.id])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return jsonify({"error": DUPLICATE_SKU_ERROR}), 409
             return jsonify({"success": True, "phone": phone.to_dict()}), 201
         return jsonify({"error": "Invalid form data"}), 400
 
@@ -107,17 +208,59 @@ def create_app():
             phone.stock_quantity = int(data["stock_quantity"])
         if "discontinued" in data:
             phone.discontinued = bool(data["discontinued"])
-        db.session.commit()
+        try:
+            db.session.flush()
+            refresh_phone_prices([phone.id])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": DUPLICATE_SKU_ERROR}), 409
         return jsonify(phone.to_dict())
 
     @app.route("/phone/<int:phone_id>/delete", methods=["DELETE"])
     @admin_required
     def delete_phone(phone_id):
         phone = Phone.query.get_or_404(phone_id)
+        delete_phone_logs(phone.id)
+        delete_phone_prices([phone.id])
+        delete_allocations([phone.id])
         db.session.delete(phone)
         db.session.commit()
         return jsonify({"success": True}), 204
 
+    def upsert_unavailable():
+        if request.args.get("mode") == "upsert" and not app.config["UPSERT_IMPORTS"]:
+            return jsonify({"error": "Upsert imports are disabled: existing phones share a SKU, "
+                                     "remove the duplicates and restart"}), 409
+        return None
+
+    def import_options():
+        try:
+            batch_size = int(request.args.get("batch_size") or DEFAULT_BATCH_SIZE)
+        except ValueError:
+            raise ValueError("batch_size must be an integer")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be greater than 0")
+        return {
+            "mode": request.args.get("mode"),
+            "batch_size": batch_size,
+            "atomic": request.args.get("atomic") == "1",
+        }
+
+    def import_upload(f, options):
+        def log_progress(p):
+            app.logger.info("bulk import batch %d: %d rows processed, %d inserted, %d errors",
+                            p["batch"], p["rows_processed"], p["inserted_count"], p["error_count"])
+
+        return run_import(f, progress=log_progress, **options)
+
+    def wants_async():
+        return request.args.get("async") == "1"
+
+    def submit_import(f, options):
+        job = submit_job("bulk_import", import_phones_job, spool_upload(f), **options)
+        return jsonify({"success": True, "job_id": job.id, "status": job.status}), 202
+
     @app.route("/bulk_upload", methods=["POST"])
     @csrf.exempt
     def bulk_upload():
@@ -127,19 +270,22 @@ def create_app():
         f = request.files.get("file")
         if not f:
             return jsonify({"error": "No file uploaded"}), 400
+        try:
+            options = import_options()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        unavailable = upsert_unavailable()
+        if unavailable:
+            return unavailable
 
         try:
-            created, errors = import_phones_from_csv(f)
-            message = f"Successfully imported {len(created)} phones"
-            if errors:
-                message += f" with {len(errors)} errors"
-            return jsonify({
-                "success": True,
-                "message": message,
-                "created_count": len(created),
-                "error_count": len(errors),
-                "errors": errors[:10]
-            }), 200
+            if wants_async():
+                return submit_import(f, options)
+            result = import_upload(f, options)
+            message = f"Successfully imported {result['created_count']} phones"
+            if result["error_count"]:
+                message += f" with {result['error_count']} errors"
+            return jsonify(dict(result, success=True, message=message, errors=result["errors"][:10])), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -150,15 +296,19 @@ def create_app():
         f = request.files.get("file")
         if not f:
             return jsonify({"error": "No file uploaded"}), 400
+        try:
+            options = import_options()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        unavailable = upsert_unavailable()
+        if unavailable:
+            return unavailable
 
         try:
-            created, errors = import_phones_from_csv(f)
-            return jsonify({
-                "success": True,
-                "created_count": len(created),
-                "error_count": len(errors),
-                "errors": errors[:10]
-            }), 200
+            if wants_async():
+                return submit_import(f, options)
+            result = import_upload(f, options)
+            return jsonify(dict(result, success=True, errors=result["errors"][:10])), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -169,48 +319,160 @@ def create_app():
             return jsonify({"error": "Admin access required"}), 403
 
         phone = Phone.query.get_or_404(phone_id)
-        if phone.stock_quantity <= 0:
-            msg = "Cannot list: out of stock"
-            log = ListingLog(phone_id=phone.id, platform=platform, success=False, message=msg)
-            db.session.add(log)
-            db.session.commit()
-            return jsonify({"success": False, "message": msg}), 400
+        try:
+            quantity = int(request.form.get("quantity") or request.args.get("quantity") or 1)
+        except ValueError:
+            return jsonify({"success": False, "message": "quantity must be an integer"}), 400
+        if quantity <= 0:
+            return jsonify({"success": False, "message": "quantity must be greater than 0"}), 400
+
+        if wants_async():
+            job = submit_job("listing", list_phone_job, phone.id, platform,
+                             request.form.get("override_price"), quantity)
+            return jsonify({"success": True, "job_id": job.id, "status": job.status}), 202
+
+        payload, status = list_phone_on_platform(phone, platform, request.form.get("override_price"), quantity)
+        return jsonify(payload), status
+
+    @app.route("/api/phones/<int:phone_id>/allocations", methods=["GET"])
+    @admin_required
+    def api_phone_allocations(phone_id):
+        phone = Phone.query.get_or_404(phone_id)
+        return jsonify({"phone_id": phone.id, "stock_quantity": phone.stock_quantity,
+                        "allocations": phone_allocations(phone.id)})
 
+    @app.route("/api/phones/<int:phone_id>/allocations/<platform>/release", methods=["POST"])
+    @csrf.exempt
+    @admin_required
+    def api_release_allocation(phone_id, platform):
+        Phone.query.get_or_404(phone_id)
+        data = request.get_json(silent=True) or {}
         try:
-            override_price = request.form.get("override_price")
-            if override_price:
-                try:
-                    override_price = float(override_price)
-                    phone.manual_overrides = phone.manual_overrides or {}
-                    phone.manual_overrides[platform] = override_price
-                    db.session.commit()
-                except (ValueError, TypeError):
-                    return jsonify({"success": False, "message": "Invalid override price"}), 400
-
-            override = (phone.manual_overrides or {}).get(platform)
-            if override:
-                final, fee = calculate_platform_price(phone.base_price, platform)
-                msg = f"Listed with manual override ${override:.2f} on {platform}"
-                log = ListingLog(phone_id=phone.id, platform=platform, success=True,
-                                 message=msg, attempted_price=override, fee=fee)
-                db.session.add(log)
-                db.session.commit()
-                return jsonify({"success": True, "message": msg, "price": override, "override": True}), 200
+            quantity = int(data["quantity"]) if data.get("quantity") is not None else None
+        except (ValueError, TypeError):
+            return jsonify({"error": "quantity must be an integer"}), 400
+        if quantity is not None and quantity <= 0:
+            return jsonify({"error": "quantity must be greater than 0"}), 400
+        released = release_stock(phone_id, platform, quantity)
+        db.session.commit()
+        if not released:
+            return jsonify({"error": "Nothing allocated to release"}), 409
+        return jsonify({"success": True, "released": released, "allocations": phone_allocations(phone_id)})
+
+    def filter_args(raw):
+        # the same filters as the /api/phones query string, so each value is one string
+        args = {}
+        for key, value in raw.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "1" if value else "0"
+            elif isinstance(value, (int, float)):
+                value = str(value)
+            if not isinstance(value, str):
+                raise ValueError(f"filter {key} must be a string, not {type(value).__name__}")
+            args[key] = value
+        return args
+
+    @app.route("/api/listings/batch", methods=["POST"])
+    @csrf.exempt
+    @admin_required
+    def api_list_batch():
+        data = request.get_json() or {}
+        platforms = data.get("platforms")
+        if not platforms or not isinstance(platforms, list):
+            return jsonify({"error": "platforms must be a non-empty list"}), 400
 
-            success, msg, final_price, fee = simulate_listing(phone, platform)
-            log = ListingLog(phone_id=phone.id, platform=platform, success=success,
-                             message=msg, attempted_price=final_price, fee=fee)
-            db.session.add(log)
-            db.session.commit()
-            return jsonify({"success": success, "message": msg, "price": final_price, "fee": fee, "override": False}), (200 if success else 400)
+        try:
+            if "phone_ids" in data:
+                phone_ids = list(dict.fromkeys(int(i) for i in data["phone_ids"]))
+            elif isinstance(data.get("filter"), dict):
+                query = apply_phone_filters(db.session.query(Phone.id), filter_args(data["filter"]))
+                phone_ids = [row[0] for row in query.order_by(Phone.id).limit(MAX_BATCH_LISTING_PHONES + 1)]
+            else:
+                return jsonify({"error": "Provide phone_ids or filter"}), 400
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": f"Invalid data: {str(e)}"}), 400
+
+        if len(phone_ids) > MAX_BATCH_LISTING_PHONES:
+            return jsonify({"error": f"At most {MAX_BATCH_LISTING_PHONES} phones per batch"}), 400
+
+        if wants_async():
+            job = submit_job("batch_listing", list_phones_batch_job, phone_ids, platforms)
+            return jsonify({"success": True, "job_id": job.id, "status": job.status}), 202
 
+        try:
+            results = list_phones_batch(Phone.query.filter(Phone.id.in_(phone_ids)), platforms, phone_ids)
         except Exception as e:
             db.session.rollback()
-            return jsonify({"success": False, "message": str(e)}), 500
+            return jsonify({"error": str(e)}), 500
+        succeeded = sum(1 for r in results if r["success"])
+        return jsonify({
+            "success": True,
+            "listed_count": succeeded,
+            "failed_count": len(results) - succeeded,
+            "results": results,
+        }), 200
 
     @app.route("/api/phones", methods=["GET"])
     def api_phones():
-        return jsonify([p.to_dict() for p in Phone.query.all()])
+        return phone_listing()
+
+    def parse_since(raw):
+        if raw == "latest":
+            return latest_seq()
+        since = int(raw or 0)
+        if since < 0:
+            raise ValueError("since must not be negative")
+        return since
+
+    def parse_stream_timeout(raw):
+        if raw in (None, ""):
+            return CHANGE_STREAM_SECONDS
+        duration = float(raw)
+        if not math.isfinite(duration) or duration <= 0:
+            raise ValueError("timeout must be a positive number of seconds")
+        # each open stream holds a worker, so clients reconnect rather than stay forever
+        return min(duration, CHANGE_STREAM_SECONDS)
+
+    @app.route("/api/phones/changes", methods=["GET"])
+    def api_phone_changes():
+        if not app.config["CHANGE_FEED"]:
+            return jsonify({"error": "Change feed is not available"}), 501
+        try:
+            since = parse_since(request.args.get("since"))
+            limit = parse_limit(request.args.get("limit"), default=DEFAULT_CHANGES_LIMIT, maximum=MAX_CHANGES_LIMIT)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(dict(changes_since(since, limit), latest_seq=latest_seq()))
+
+    @app.route("/api/phones/changes/stream", methods=["GET"])
+    def api_phone_change_stream():
+        if not app.config["CHANGE_FEED"]:
+            return jsonify({"error": "Change feed is not available"}), 501
+        try:
+            # EventSource resends the last id it saw when reconnecting
+            since = parse_since(request.headers.get("Last-Event-ID") or request.args.get("since"))
+            duration = parse_stream_timeout(request.args.get("timeout"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return Response(stream_with_context(change_stream(since, duration)), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route("/api/tags", methods=["GET"])
+    def api_tags():
+        if not app.config["TAG_INDEX"]:
+            return jsonify({"error": "Tag index is not available"}), 501
+        try:
+            limit = parse_limit(request.args.get("limit"), default=None, maximum=MAX_TAG_COUNTS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        prefix = sanitize_string(request.args.get("prefix") or "")
+        # phone_tags is written in the same transaction as phones, so the catalog version
+        # also moves when another worker retags a phone
+        version, _ = catalog_version()
+        return read_cache().response(request_cache_key("tags", version),
+                                     lambda: jsonify({"tags": tag_counts(prefix, limit)}))
 
     @app.route("/api/phones", methods=["POST"])
     @csrf.exempt
@@ -237,9 +499,14 @@ def create_app():
             )
             
             db.session.add(phone)
+            db.session.flush()
+            refresh_phone_prices([phone.id])
             db.session.commit()
             return jsonify({"success": True, "phone": phone.to_dict()}), 201
             
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": DUPLICATE_SKU_ERROR}), 409
         except (ValueError, TypeError) as e:
             db.session.rollback()
             return jsonify({"error": f"Invalid data: {str(e)}"}), 400
@@ -249,7 +516,7 @@ def create_app():
 
     @app.route("/api/phones/<int:phone_id>", methods=["GET"])
     def api_phone(phone_id):
-        return jsonify(Phone.query.get_or_404(phone_id).to_dict())
+        return phone_response(phone_id, lambda: jsonify(Phone.query.get_or_404(phone_id).to_dict()))
 
     @app.route("/api/phones/<int:phone_id>", methods=["PUT"])
     @csrf.exempt
@@ -258,7 +525,7 @@ def create_app():
         phone = Phone.query.get_or_404(phone_id)
         data = request.get_json() or {}
         
-        print(f"Updating phone {phone_id} with data: {data}")
+        app.logger.debug("Updating phone %s with data: %s", phone_id, data)
         
         try:
             for field in ["model_name", "brand", "condition", "storage", "color", "tags"]:
@@ -272,16 +539,21 @@ def create_app():
             if "discontinued" in data:
                 phone.discontinued = bool(data["discontinued"])
             
+            db.session.flush()
+            refresh_phone_prices([phone.id])
             db.session.commit()
             return jsonify({"success": True, "phone": phone.to_dict()}), 200
             
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": DUPLICATE_SKU_ERROR}), 409
         except (ValueError, TypeError) as e:
             db.session.rollback()
-            print(f"ValueError in update: {str(e)}")
+            app.logger.info("Invalid update for phone %s: %s", phone_id, e)
             return jsonify({"error": f"Invalid data: {str(e)}"}), 400
         except Exception as e:
             db.session.rollback()
-            print(f"Exception in update: {str(e)}")
+            app.logger.exception("Failed to update phone %s", phone_id)
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/phones/<int:phone_id>", methods=["DELETE"])
@@ -291,7 +563,9 @@ def create_app():
         try:
             phone = Phone.query.get_or_404(phone_id)
             
-            ListingLog.query.filter_by(phone_id=phone_id).delete()
+            delete_phone_logs(phone_id)
+            delete_phone_prices([phone_id])
+            delete_allocations([phone_id])
             db.session.delete(phone)
             db.session.commit()
             return jsonify({"success": True, "message": f"Phone {phone_id} deleted successfully"}), 200
@@ -299,15 +573,113 @@ def create_app():
             db.session.rollback()
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/api/stats", methods=["GET"])
+    @admin_required
+    def api_stats():
+        try:
+            threshold = int(request.args.get("low_stock") or DEFAULT_LOW_STOCK_THRESHOLD)
+        except ValueError:
+            return jsonify({"error": "low_stock must be an integer"}), 400
+        if not 0 <= threshold <= MAX_LOW_STOCK_THRESHOLD:
+            return jsonify({"error": f"low_stock must be between 0 and {MAX_LOW_STOCK_THRESHOLD}"}), 400
+        return jsonify(get_stats(threshold, ttl=app.config["STATS_TTL"]))
+
+    @app.route("/api/export/<kind>", methods=["GET"])
+    @admin_required
+    def api_export(kind):
+        if kind not in ("phones", "logs"):
+            return jsonify({"error": "Unknown export"}), 404
+        fmt = request.args.get("format") or "ndjson"
+        if fmt not in ("ndjson", "csv"):
+            return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+        try:
+            query = phone_export_query(request.args) if kind == "phones" else log_export_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return export_response(kind, query, fmt)
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        cache_stats = read_cache().stats()
+        extra = {f"read_cache_{name}_total": ("counter", cache_stats[name])
+                 for name in ("hits", "misses", "evictions", "expired", "invalidations", "uncacheable")}
+        extra["read_cache_entries"] = ("gauge", cache_stats["entries"])
+        return metrics_response(metrics, extra)
+
+    @app.route("/api/cache/stats", methods=["GET"])
+    @admin_required
+    def api_cache_stats():
+        return jsonify(read_cache().stats())
+
+    @app.route("/api/platforms/dispatch", methods=["GET"])
+    @admin_required
+    def api_platform_dispatch():
+        dispatcher = listing_dispatcher()
+        if dispatcher is None:
+            return jsonify({"error": "Listings are evaluated in-process; set PLATFORM_API_URL"}), 501
+        return jsonify(dispatcher.stats())
+
+    @app.route("/api/jobs/<int:job_id>", methods=["GET"])
+    @admin_required
+    def api_job(job_id):
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job)
+
     @app.route("/api/logs", methods=["GET"])
     def api_logs():
         if not (request.args.get("admin") == "1" or request.headers.get("X-ADMIN") == "1"):
             return jsonify({"error": "Admin access required"}), 403
-        logs = ListingLog.query.order_by(ListingLog.created_at.desc()).limit(200).all()
-        return jsonify([log.to_dict() for log in logs])
+        try:
+            if request.args.get("group") == "day":
+                limit = parse_limit(request.args.get("limit"), default=DEFAULT_SUMMARY_LIMIT)
+                return jsonify(daily_log_summary(request.args, limit))
+            if wants_log_pagination(request.args):
+                return jsonify(paginate_logs(request.args))
+            return serialize_rows(iter_log_dicts(newest_logs(request.args)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/api/logs/archive", methods=["POST"])
+    @csrf.exempt
+    @admin_required
+    def api_archive_logs():
+        try:
+            retention_days = int(request.args.get("retention_days") or app.config["LOG_RETENTION_DAYS"])
+        except ValueError:
+            return jsonify({"error": "retention_days must be an integer"}), 400
+        if retention_days < 1:
+            return jsonify({"error": "retention_days must be at least 1"}), 400
+        archive_dir = app.config["LOG_ARCHIVE_DIR"] or os.path.join(app.instance_path, "log_archive")
+        if wants_async():
+            job = submit_job("log_archive", archive_logs_job, archive_dir, retention_days,
+                             app.config["LOG_RETENTION_BATCH"])
+            return jsonify({"success": True, "job_id": job.id, "status": job.status}), 202
+        return jsonify(archive_logs(archive_dir, retention_days, app.config["LOG_RETENTION_BATCH"]))
+
+    @app.route("/api/phones/<int:phone_id>/listings", methods=["GET"])
+    @admin_required
+    def api_phone_listings(phone_id):
+        Phone.query.get_or_404(phone_id)
+        try:
+            return jsonify(paginate_logs(request.args, phone_id=phone_id))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     @app.route("/api/phones/<int:phone_id>/price/<platform>", methods=["GET"])
     def api_phone_price(phone_id, platform):
+        return price_response(phone_id, platform, lambda: build_phone_price(phone_id, platform))
+
+    def build_phone_price(phone_id, platform):
+        stored = db.session.get(PhonePrice, (phone_id, platform))
+        if stored is not None:
+            return jsonify({
+                "price": stored.final_price,
+                "fee": stored.fee,
+                "override": stored.is_override
+            })
+
         phone = Phone.query.get_or_404(phone_id)
         
         override = (phone.manual_overrides or {}).get(platform)
@@ -328,22 +700,76 @@ def create_app():
         except Exception as e:
             return jsonify({"error": str(e)}), 400
 
+    def requested_platforms(raw=None):
+        raw = raw if raw is not None else request.args.get("platforms")
+        if not raw:
+            return list(PLATFORM_FEES)
+        if isinstance(raw, str):
+            raw = raw.split(",")
+        platforms = [str(p).strip() for p in raw if str(p).strip()]
+        unknown = [p for p in platforms if p not in PLATFORM_FEES]
+        if unknown:
+            raise ValueError(f"Unknown platform: {', '.join(unknown)}")
+        return platforms
+
+    @app.route("/api/prices/matrix", methods=["GET"])
+    def api_price_matrix():
+        try:
+            platforms = requested_platforms()
+            query = apply_phone_filters(Phone.query, request.args)
+            ids = request.args.get("ids")
+            if ids:
+                query = query.filter(Phone.id.in_([int(i) for i in ids.split(",") if i.strip()]))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        matrix = build_price_matrix(load_pricing_rows(query), platforms)
+        return jsonify({"platforms": platforms, "phones": matrix})
+
+    def bulk_price_response(raw_ids, raw_platforms):
+        try:
+            if isinstance(raw_ids, str):
+                raw_ids = [i for i in raw_ids.split(",") if i.strip()]
+            phone_ids = [int(i) for i in raw_ids or []]
+            platforms = requested_platforms(raw_platforms)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        if not phone_ids:
+            return jsonify({"error": "ids must be a non-empty list"}), 400
+        if len(phone_ids) > MAX_BULK_PRICE_PHONES:
+            return jsonify({"error": f"At most {MAX_BULK_PRICE_PHONES} phones per request"}), 400
+
+        prices, not_found = lookup_prices(phone_ids, platforms)
+        return jsonify({
+            "platforms": platforms,
+            "prices": {str(phone_id): by_platform for phone_id, by_platform in prices.items()},
+            "not_found": not_found,
+        })
+
+    @app.route("/api/prices", methods=["GET"])
+    def api_prices():
+        return bulk_price_response(request.args.get("ids"), request.args.get("platforms"))
+
+    @app.route("/api/prices/bulk", methods=["POST"])
+    @csrf.exempt
+    def api_prices_bulk():
+        data = request.get_json() or {}
+        return bulk_price_response(data.get("ids"), data.get("platforms"))
+
     @app.route("/api/update-prices", methods=["POST"])
     @csrf.exempt
     @admin_required
     def api_update_prices():
         try:
-            phones = Phone.query.all()
-            updated_count = 0
-            
-            for phone in phones:
-                if phone.base_price > 0:
-                    updated_count += 1
+            rows = load_pricing_rows()
+            matrix = build_price_matrix(rows, list(PLATFORM_FEES))
+            stored = persist_price_matrix(matrix)
             db.session.commit()
+            updated_count = sum(1 for row in rows if row.base_price > 0)
             
             return jsonify({
                 "success": True,
                 "updated_count": updated_count,
+                "stored_prices": stored,
                 "message": f"Price calculations refreshed for {updated_count} phones"
             }), 200
             
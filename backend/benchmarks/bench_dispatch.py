@@ -0,0 +1,150 @@
+import argparse
+import json
+import sys
+import time
+
+from common import make_app, seed_phones, remove_db
+from dispatcher import HttpPlatformClient, ListingDispatcher, PlatformError, listing_request
+from models import db, Phone
+from platform_mock import simulate_listing
+from platform_server import MockPlatformServer
+from platforms import registry
+
+PLATFORMS = ["X", "Y", "Z"]
+
+
+def dispatch_settings(rate=None, concurrency=None):
+    settings = {}
+    for name, configured in registry.dispatch.items():
+        settings[name] = dict(configured)
+        if rate is not None:
+            settings[name].update(rate=float(rate), burst=max(1, int(rate)))
+        if concurrency is not None:
+            settings[name]["concurrency"] = concurrency
+    return settings
+
+
+def load_phones(count):
+    rows = db.session.query(Phone.id, Phone.base_price, Phone.condition, Phone.tags) \
+        .order_by(Phone.id).limit(count).all()
+    return [{"id": r.id, "base_price": r.base_price, "condition": r.condition, "tags": r.tags} for r in rows]
+
+
+def run_sequential(url, phones):
+    # what listing against a remote API looks like without the dispatcher: one blocking call after another
+    client = HttpPlatformClient(url)
+    failures = 0
+    start = time.perf_counter()
+    for phone in phones:
+        for platform in PLATFORMS:
+            try:
+                client.list(platform, listing_request(phone), 2.0)
+            except PlatformError:
+                failures += 1
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "listings_per_s": round(len(phones) * len(PLATFORMS) / elapsed, 1),
+            "failures": failures}
+
+
+def check_parity(phones, results, down=()):
+    expected = {(p["id"], platform): simulate_listing(p, platform) for p in phones for platform in PLATFORMS}
+    problems = []
+    for result in results:
+        key = (result["phone_id"], result["platform"])
+        unavailable = result["message"].startswith(f"Platform {result['platform']} unavailable")
+        if result["platform"] in down:
+            if not unavailable:
+                problems.append(f"{key}: expected the platform to be unavailable, got {result['message']!r}")
+            continue
+        if unavailable:
+            continue
+        success, message, price, fee = expected[key]
+        if (result["success"], result["message"], result.get("price")) != (success, message, price):
+            problems.append(f"{key}: {result['message']!r} != {message!r}")
+    return problems
+
+
+def duplicate_listings(accepted_before, counts, stats):
+    # the platform must not accept a listing more often than it was asked for one
+    problems = []
+    for platform, lane in stats.items():
+        key = f"{platform}:accepted"
+        accepted = counts.get(key, 0) - accepted_before.get(key, 0)
+        if accepted > lane["calls"]:
+            problems.append(f"{platform}: {accepted} listings accepted for {lane['calls']} calls")
+    return problems
+
+
+def run_scenario(name, phones, latency_ms, jitter_ms, error_rate, settings, down=(), sequential=False,
+                 stall_rate=0.0, stall_ms=0):
+    server = MockPlatformServer(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, seed=7,
+                                stall_rate=stall_rate, stall_ms=stall_ms).start()
+    app, db_path = make_app(PLATFORM_API_URL=server.url)
+    try:
+        app.extensions["listing_dispatcher"].shutdown()
+        dispatcher = app.extensions["listing_dispatcher"] = ListingDispatcher(HttpPlatformClient(server.url),
+                                                                              settings)
+        with app.app_context():
+            seed_phones(phones)
+            db.session.query(Phone).update({Phone.stock_quantity: 100}, synchronize_session=False)
+            db.session.commit()
+            rows = load_phones(phones)
+        baseline = run_sequential(server.url, rows) if sequential else None
+        client = app.test_client()
+        accepted_before = dict(server.counts)
+        start = time.perf_counter()
+        response = client.post("/api/listings/batch?admin=1",
+                               json={"phone_ids": [p["id"] for p in rows], "platforms": PLATFORMS})
+        elapsed = time.perf_counter() - start
+        results = response.get_json()["results"]
+        problems = check_parity(rows, results, down)
+        stats = dispatcher.stats()
+        problems += duplicate_listings(accepted_before, server.counts, stats)
+        dispatcher.shutdown()
+        report = {
+            "scenario": name,
+            "listings": len(results),
+            "seconds": round(elapsed, 3),
+            "listings_per_s": round(len(results) / elapsed, 1),
+            "succeeded": sum(1 for r in results if r["success"]),
+            "unavailable": sum(1 for r in results if "unavailable" in r["message"]),
+            "server_responses": dict(sorted(server.counts.items())),
+            "dispatcher": {platform: {key: s[key] for key in ("calls", "succeeded", "failed", "retries",
+                                                              "timeouts", "rate_limited", "circuit_rejected",
+                                                              "circuit", "circuit_opened")}
+                           for platform, s in stats.items()},
+            "parity_mismatches": problems[:20],
+        }
+        if baseline:
+            report["sequential"] = baseline
+            report["speedup"] = round(baseline["seconds"] / elapsed, 2)
+        return report
+    finally:
+        server.stop()
+        with app.app_context():
+            db.engine.dispose()
+        remove_db(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential vs dispatched listings against the mock platform server")
+    parser.add_argument("--phones", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--flaky-error-rate", type=float, default=0.1)
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, help="override every platform's rate limit (calls/s)")
+    parser.add_argument("--concurrency", type=int, help="override every platform's concurrency")
+    args = parser.parse_args()
+    settings = dispatch_settings(args.rate, args.concurrency)
+    results = [
+        run_scenario("healthy", args.phones, args.latency_ms, args.jitter_ms, 0, settings, sequential=True),
+        run_scenario("flaky", args.phones, args.latency_ms, args.jitter_ms, args.flaky_error_rate, settings),
+        run_scenario("z_outage", args.phones, args.latency_ms, args.jitter_ms, {"Z": 1.0}, settings, down=("Z",)),
+        # accepted, then answered after the client gave up: retries must not list twice
+        run_scenario("stalled", args.phones, args.latency_ms, args.jitter_ms, 0, settings,
+                     stall_rate=args.stall_rate, stall_ms=max(s["timeout"] for s in settings.values()) * 1500),
+    ]
+    print(json.dumps({"latency_ms": args.latency_ms, "dispatch": settings, "results": results}, indent=2))
+    if any(r.get("parity_mismatches") for r in results):
+        sys.exit("dispatched listings disagree with in-process evaluation or were accepted twice")
@@ -0,0 +1,84 @@
+import argparse
+import json
+import sys
+from urllib.parse import urlencode
+
+from common import make_app, seed_phones, timed, remove_db
+from facets import VALUE_FACETS, FLAG_FACETS
+
+SCENARIOS = {
+    "none": {},
+    "brand": {"brand": "Apple"},
+    "brands_storage_stock": {"brand": "Apple,Samsung", "storage": "256GB", "in_stock": "1"},
+    "price_color": {"min_price": "20000", "max_price": "50000", "color": "Black"},
+    "text_condition": {"q": "galaxy", "condition": "Good,Excellent"},
+}
+
+
+def url(params):
+    return "/api/phones?" + urlencode(params)
+
+
+def check_parity(client, params, page):
+    # each facet count must equal a plain filtered count with that facet's selection replaced
+    problems = []
+    for name, values in page["facets"].items():
+        if name == "price":
+            if sum(v["count"] for v in values) != page["total"]:
+                problems.append("price buckets do not add up to total")
+            continue
+        for entry in values:
+            value = entry["value"]
+            if name in FLAG_FACETS:
+                value = "1" if value else "0"
+            counted = client.get(url({**params, name: value, "limit": 1, "count": "1"})).get_json()["total"]
+            if counted != entry["count"]:
+                problems.append(f"{name}={value}: facet says {entry['count']}, filter counts {counted}")
+    return problems
+
+
+def run(sizes, repeat, check):
+    results = []
+    problems = []
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            client = app.test_client()
+            with app.app_context():
+                seed_phones(size)
+            full = timed(lambda: client.get("/api/phones").get_data(), max(1, repeat // 5))
+            for name, params in SCENARIOS.items():
+                page = client.get(url({**params, "limit": 50, "facets": "1"})).get_json()
+                if check:
+                    problems += [f"{size}/{name}: {p}" for p in check_parity(client, params, page)]
+                results.append({
+                    "rows": size,
+                    "scenario": name,
+                    "matches": page["total"],
+                    "page_50": timed(lambda: client.get(url({**params, "limit": 50})).get_data(), repeat),
+                    "page_50_count": timed(lambda: client.get(url({**params, "limit": 50, "count": "1"}))
+                                           .get_data(), repeat),
+                    "page_50_facets": timed(lambda: client.get(url({**params, "limit": 50, "facets": "1"}))
+                                            .get_data(), repeat),
+                    # what the storefront did before: download everything and filter in the browser
+                    "full_list": full,
+                    "facets": {facet: len(page["facets"][facet]) for facet in list(VALUE_FACETS) + ["price"]},
+                })
+        finally:
+            with app.app_context():
+                from models import db
+                db.engine.dispose()
+            remove_db(db_path)
+    return results, problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faceted catalog queries: page + facet counts vs full download")
+    parser.add_argument("--sizes", default="100000,300000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-check", action="store_true", help="skip the facet count parity check")
+    args = parser.parse_args()
+    results, problems = run([int(s) for s in args.sizes.split(",")], args.repeat, not args.no_check)
+    print(json.dumps({"results": results, "parity_problems": problems[:20]}, indent=2))
+    if problems:
+        sys.exit("facet counts disagree with filtered counts")
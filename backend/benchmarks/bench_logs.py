@@ -0,0 +1,140 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from common import make_app, seed_phones, seed_listing_logs, timed, remove_db
+from models import db, ListingLog, ListingLogDaily
+
+PHONES = 10000
+LOG_INDEXES = ["ix_listing_logs_created_at", "ix_listing_logs_phone_created", "ix_listing_logs_platform_created"]
+
+
+def measure(client, repeat):
+    first = client.get("/api/logs?admin=1&limit=50").get_json()
+    cursor = first["next_cursor"]
+    for _ in range(20):
+        cursor = client.get(f"/api/logs?admin=1&limit=50&cursor={cursor}").get_json()["next_cursor"]
+    return {
+        "newest_200": timed(lambda: client.get("/api/logs?admin=1").get_data(), repeat),
+        "page_50": timed(lambda: client.get("/api/logs?admin=1&limit=50").get_data(), repeat),
+        "page_50_after_1000": timed(lambda: client.get(f"/api/logs?admin=1&limit=50&cursor={cursor}").get_data(), repeat),
+        "platform_page_50": timed(lambda: client.get("/api/logs?admin=1&limit=50&platform=Y").get_data(), repeat),
+        "phone_history_50": timed(lambda: client.get("/api/phones/4242/listings?admin=1&limit=50").get_data(), repeat),
+    }
+
+
+def run(sizes, repeat, compare_unindexed):
+    results = []
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            client = app.test_client()
+            with app.app_context():
+                seed_phones(PHONES)
+                seed_listing_logs(size, PHONES)
+            result = {"logs": size, "indexed": measure(client, repeat)}
+            if compare_unindexed:
+                with app.app_context():
+                    for name in LOG_INDEXES:
+                        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                    db.session.commit()
+                result["unindexed"] = measure(client, max(1, repeat // 5))
+            results.append(result)
+        finally:
+            remove_db(db_path)
+    return results
+
+
+def archived_lines(archive_dir):
+    count = 0
+    for name in os.listdir(archive_dir):
+        with gzip.open(os.path.join(archive_dir, name), "rt") as f:
+            count += sum(1 for _ in f)
+    return count
+
+
+def measure_retention(client, repeat):
+    return {
+        "stats": timed(lambda: client.get("/api/stats?admin=1").get_data(), repeat),
+        "daily_200": timed(lambda: client.get("/api/logs?admin=1&group=day").get_data(), repeat),
+        "phone_daily": timed(lambda: client.get("/api/logs?admin=1&group=day&phone_id=4242").get_data(), repeat),
+    }
+
+
+def run_retention(size, repeat, retention_days):
+    # stats and daily summaries must read the same before and after the old rows move
+    # into rollups and the archive
+    archive_dir = tempfile.mkdtemp(prefix="bench_archive_")
+    app, db_path = make_app(LOG_ARCHIVE_DIR=archive_dir, STATS_TTL=0)
+    try:
+        client = app.test_client()
+        with app.app_context():
+            seed_phones(PHONES)
+            seed_listing_logs(size, PHONES)
+        stats_before = client.get("/api/stats?admin=1").get_json()["platforms"]
+        summary_before = client.get("/api/logs?admin=1&group=day&phone_id=4242&limit=500").get_json()
+        before = measure_retention(client, repeat)
+
+        began = time.perf_counter()
+        archive = client.post(f"/api/logs/archive?admin=1&retention_days={retention_days}").get_json()
+        elapsed = time.perf_counter() - began
+
+        after = measure_retention(client, repeat)
+        problems = []
+        if client.get("/api/stats?admin=1").get_json()["platforms"] != stats_before:
+            problems.append("platform stats changed after archiving")
+        if client.get("/api/logs?admin=1&group=day&phone_id=4242&limit=500").get_json() != summary_before:
+            problems.append("daily summaries changed after archiving")
+        if archived_lines(archive_dir) != archive["archived"]:
+            problems.append("archive files do not hold every archived row")
+        with app.app_context():
+            remaining = ListingLog.query.count()
+            rollups = ListingLogDaily.query.count()
+        if remaining + archive["archived"] != size:
+            problems.append(f"{remaining} raw + {archive['archived']} archived != {size} seeded")
+        archive_bytes = sum(os.path.getsize(os.path.join(archive_dir, n)) for n in os.listdir(archive_dir))
+        return {
+            "logs": size,
+            "retention_days": retention_days,
+            "archived": archive["archived"],
+            "archive_rows_per_s": round(archive["archived"] / elapsed, 1),
+            "archive_bytes_per_row": round(archive_bytes / max(archive["archived"], 1), 1),
+            "raw_rows_left": remaining,
+            "rollup_rows": rollups,
+            "before": before,
+            "after": after,
+            "delete_phone": timed(lambda: client.delete(
+                f"/api/phones/{client.get('/api/phones?limit=1&order=desc').get_json()['items'][0]['id']}?admin=1"
+            ).get_data(), 5),
+            "problems": problems,
+        }
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        remove_db(db_path)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing log pagination and filters at large sizes")
+    parser.add_argument("--sizes", default="1000000,3000000")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--compare-unindexed", action="store_true")
+    parser.add_argument("--retention-days", type=int,
+                        help="instead, archive logs older than this and compare stats and summaries before/after")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if args.retention_days:
+        results = [run_retention(size, args.repeat, args.retention_days) for size in sizes]
+        print(json.dumps(results, indent=2))
+        if any(r["problems"] for r in results):
+            sys.exit("log retention changed what stats or summaries report")
+    else:
+        print(json.dumps(run(sizes, args.repeat, args.compare_unindexed), indent=2))
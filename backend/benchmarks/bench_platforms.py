@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import time
+
+import common  # noqa: F401  (puts backend/ on sys.path)
+from platform_mock import simulate_listing, simulate_listings
+from pricing import round_money
+
+LEGACY_CONDITION_MAP = {
+    "X": {"New": "New", "Good": "Good", "Scrap": "Scrap", "As New": "Good",
+          "Excellent": "Good", "Usable": "Scrap"},
+    "Y": {"New": "3 stars (Excellent)", "Good": "2 stars (Good)", "Scrap": "1 star (Usable)",
+          "As New": "3 stars (Excellent)", "Excellent": "3 stars (Excellent)", "Usable": "1 star (Usable)"},
+    "Z": {"New": "New", "Good": "Good", "Scrap": "Good", "As New": "As New",
+          "Excellent": "As New", "Usable": "Good"},
+}
+
+
+# the pre-registry implementation, kept here only as the comparison baseline
+def legacy_calculate_platform_price(base_price, platform):
+    base_price = float(base_price)
+    if base_price <= 0:
+        raise ValueError("Base price must be greater than 0")
+    if platform == "X":
+        fee = 0.10 * base_price
+    elif platform == "Y":
+        fee = 0.08 * base_price + 2.0
+    elif platform == "Z":
+        fee = 0.12 * base_price
+    else:
+        raise ValueError(f"Unknown platform: {platform}")
+    final = max(0, base_price - fee)
+    return round_money(final), round_money(fee)
+
+
+def legacy_simulate_listing(phone, platform):
+    base_price = float(phone["base_price"] if isinstance(phone, dict) else phone.base_price)
+    condition = phone["condition"] if isinstance(phone, dict) else phone.condition
+    tags = (phone.get("tags", "") if isinstance(phone, dict) else (phone.tags or "")) or ""
+    tags = tags.lower()
+    final_price, fee = legacy_calculate_platform_price(base_price, platform)
+    mapping = LEGACY_CONDITION_MAP[platform]
+    label = mapping.get(condition, mapping.get("Good", condition))
+    if platform == "Y" and "usable" in label.lower() and base_price < 20:
+        return (False, "Platform Y rejects very low-priced 'Usable' items", final_price, fee)
+    if final_price < 5.0 and base_price < 50:
+        return (False, f"Fees too high on platform {platform}, margin ${final_price:.2f}", final_price, fee)
+    if "discontinued" in tags:
+        return (False, f"Phone marked discontinued — platform {platform} refused listing", final_price, fee)
+    return (True, f"Listed on platform {platform} as '{label}' at ${final_price:.2f} (fee ${fee:.2f})",
+            final_price, fee)
+
+
+def sample_phones(count, seed=11):
+    rng = random.Random(seed)
+    conditions = ["New", "Excellent", "Good", "Fair", "As New", "Usable", "Scrap"]
+    return [{
+        "base_price": rng.choice([rng.uniform(1, 60), rng.uniform(60, 90000)]),
+        "condition": rng.choice(conditions),
+        "tags": rng.choice(["", "camera", "budget,discontinued", "flagship"]),
+    } for _ in range(count)]
+
+
+def run(count, platforms):
+    phones = sample_phones(count)
+    mismatches = sum(1 for p in phones for pl in platforms
+                     if legacy_simulate_listing(p, pl) != simulate_listing(p, pl))
+
+    def throughput(fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        return round(count * len(platforms) / elapsed)
+
+    return {
+        "phones": count,
+        "platforms": platforms,
+        "legacy_evals_per_s": throughput(lambda: [legacy_simulate_listing(p, pl) for p in phones for pl in platforms]),
+        "registry_evals_per_s": throughput(lambda: [simulate_listing(p, pl) for p in phones for pl in platforms]),
+        "registry_fanout_evals_per_s": throughput(lambda: [simulate_listings(p, platforms) for p in phones]),
+        "parity_mismatches": mismatches,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing rule evaluation: if/elif chain vs compiled registry")
+    parser.add_argument("--phones", type=int, default=100000)
+    parser.add_argument("--platforms", default="X,Y,Z")
+    args = parser.parse_args()
+    result = run(args.phones, args.platforms.split(","))
+    print(json.dumps(result, indent=2))
+    if result["parity_mismatches"]:
+        raise SystemExit("registry results differ from the legacy implementation")
@@ -0,0 +1,87 @@
+import argparse
+import json
+import random
+import time
+
+import common  # noqa: F401  (puts backend/ on sys.path)
+from pricing import PLATFORM_FEES, calculate_platform_price
+from price_matrix import compute_price_matrix
+
+
+def check_parity(base_prices, platforms):
+    valid, finals, fees = compute_price_matrix(base_prices, platforms)
+    mismatches = 0
+    for i, base in enumerate(base_prices):
+        if not valid[i]:
+            # the scalar path must refuse the same prices
+            if base > 0:
+                mismatches += len(platforms)
+            continue
+        for platform in platforms:
+            final, fee = calculate_platform_price(base, platform)
+            if final != finals[platform][i] or fee != fees[platform][i]:
+                mismatches += 1
+    return mismatches
+
+
+def sample_prices(count, seed=7):
+    rng = random.Random(seed)
+    prices = [round(rng.uniform(1, 100000), 2) for _ in range(count)]
+    # exact half-cent ties exercise the ROUND_HALF_UP fallback
+    prices += [x / 1000 for x in range(5, 200000, 10)][:count]
+    return prices
+
+
+# prices where vectorized rounding is most likely to drift: half-cent ties, values
+# whose float error lands next to a tie, tiny and huge prices, and invalid ones
+EDGE_PRICES = [0.01, 0.005, 0.015, 0.025, 1.005, 2.675, 10.045, 100.125, 1000.335, 99999.995,
+               123456789.125, 1e-9, 0, -1, -0.005]
+
+
+def check(count=2000):
+    # a quick pass/fail parity run without the timings, e.g. before a commit
+    prices = EDGE_PRICES + sample_prices(count)
+    mismatches = check_parity(prices, list(PLATFORM_FEES))
+    print(json.dumps({"prices": len(prices), "platforms": len(PLATFORM_FEES), "parity_mismatches": mismatches}))
+    return mismatches
+
+
+def run(sizes):
+    platforms = list(PLATFORM_FEES)
+    results = []
+    for size in sizes:
+        prices = sample_prices(size)
+
+        start = time.perf_counter()
+        for base in prices:
+            for platform in platforms:
+                calculate_platform_price(base, platform)
+        scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compute_price_matrix(prices, platforms)
+        vector = time.perf_counter() - start
+
+        results.append({
+            "prices": len(prices),
+            "platforms": len(platforms),
+            "scalar_ms": round(scalar * 1000, 3),
+            "vectorized_ms": round(vector * 1000, 3),
+            "parity_mismatches": check_parity(prices, platforms),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalar vs vectorized platform pricing")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--check", action="store_true", help="only check parity on edge and sample prices")
+    args = parser.parse_args()
+    if args.check:
+        if check():
+            raise SystemExit("vectorized prices differ from calculate_platform_price")
+        raise SystemExit(0)
+    results = run([int(s) for s in args.sizes.split(",")])
+    print(json.dumps(results, indent=2))
+    if any(r["parity_mismatches"] for r in results):
+        raise SystemExit("vectorized prices differ from calculate_platform_price")
@@ -0,0 +1,36 @@
+import argparse
+import json
+
+from common import make_app, seed_phones, timed, remove_db
+
+QUERIES = ["galaxy", "pix", "camera", "apple 256", "redmi note"]
+
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            client = app.test_client()
+            with app.app_context():
+                seed_phones(size)
+            for q in QUERIES:
+                results.append({
+                    "rows": size,
+                    "query": q,
+                    "fts_ranked": timed(lambda: client.get(f"/api/search?q={q}&limit=20").get_data(), repeat),
+                    "fts_filter": timed(lambda: client.get(f"/api/phones?q={q}&limit=20&match=fts").get_data(), repeat),
+                    "like_scan": timed(lambda: client.get(f"/api/phones?q={q}&limit=20").get_data(), repeat),
+                })
+        finally:
+            remove_db(db_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search latency: FTS5 index vs LIKE scan")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(json.dumps(run(sizes, args.repeat), indent=2))
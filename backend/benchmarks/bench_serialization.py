@@ -0,0 +1,54 @@
+import argparse
+import json
+import time
+
+from flask import jsonify
+
+from common import make_app, seed_phones, remove_db
+from models import Phone
+from serializers import iter_phone_dicts, serialize_rows, orjson
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                seed_phones(size)
+
+            with app.test_request_context("/api/phones"):
+                def to_dict_path():
+                    jsonify([p.to_dict() for p in Phone.query.order_by(Phone.id).all()]).get_data()
+
+                def bulk_path():
+                    serialize_rows(iter_phone_dicts(Phone.query.order_by(Phone.id)),
+                                   mimetype="application/json").get_data()
+
+                results.append({
+                    "rows": size,
+                    "orjson": orjson is not None,
+                    "to_dict_jsonify_ms": best_of(to_dict_path, repeat),
+                    "bulk_stream_ms": best_of(bulk_path, repeat),
+                })
+        finally:
+            remove_db(db_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phone.to_dict()+jsonify vs bulk column serializer")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run([int(s) for s in args.sizes.split(",")], args.repeat), indent=2))
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+
+from sqlalchemy import func
+
+from common import make_app, seed_phones, drive_threads, latency_summary, remove_db
+from models import db, Phone, ListingLog, StockAllocation
+
+
+def snapshot_stock():
+    return dict(db.session.query(Phone.id, Phone.stock_quantity))
+
+
+def check_invariants(initial):
+    stock = snapshot_stock()
+    allocated = dict(db.session.query(StockAllocation.phone_id, func.sum(StockAllocation.quantity))
+                     .group_by(StockAllocation.phone_id))
+    listed = dict(db.session.query(ListingLog.phone_id, func.count(ListingLog.id))
+                  .filter(ListingLog.success.is_(True)).group_by(ListingLog.phone_id))
+    problems = []
+    for phone_id, start in initial.items():
+        now, held = stock[phone_id], int(allocated.get(phone_id) or 0)
+        if now < 0:
+            problems.append(f"phone {phone_id}: negative stock {now}")
+        if now + held != start:
+            problems.append(f"phone {phone_id}: {now} in stock + {held} allocated != {start} initial")
+        if listed.get(phone_id, 0) != held:
+            problems.append(f"phone {phone_id}: {listed.get(phone_id, 0)} successful listings, {held} allocated")
+    return problems
+
+
+def run_scenario(name, phones, hot, threads, duration, stock):
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            seed_phones(phones)
+            # every phone starts with a few units so the hot set sells out mid-run
+            db.session.query(Phone).update({Phone.stock_quantity: stock}, synchronize_session=False)
+            db.session.commit()
+            initial = snapshot_stock()
+        targets = list(range(1, (hot or phones) + 1))
+
+        def single(client, rng):
+            return client.post(f"/list/{rng.choice(targets)}/{rng.choice('XYZ')}?admin=1").status_code
+
+        def batch(client, rng):
+            return client.post("/api/listings/batch?admin=1",
+                               json={"phone_ids": rng.sample(targets, min(5, len(targets))),
+                                     "platforms": ["X", "Y", "Z"]}).status_code
+
+        samples, errors = drive_threads(app, [("single", 4, single), ("batch", 1, batch)], threads, duration)
+        with app.app_context():
+            problems = check_invariants(initial)
+            sold = sum(initial.values()) - sum(snapshot_stock().values())
+        total = sum(len(values) for values in samples.values())
+        return {
+            "scenario": name,
+            "phones": phones,
+            "hot_phones": len(targets),
+            "threads": threads,
+            "requests_per_s": round(total / duration, 1),
+            "units_sold": sold,
+            "errors": errors,
+            "operations": {op: latency_summary(values) for op, values in samples.items()},
+            "invariant_violations": problems[:20],
+        }
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        remove_db(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent listings against shared stock; fails on overselling")
+    parser.add_argument("--phones", type=int, default=10000)
+    parser.add_argument("--hot", type=int, default=5, help="phones every thread fights over")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--stock", type=int, default=20, help="initial units per phone")
+    args = parser.parse_args()
+    results = [
+        run_scenario("hot", args.phones, args.hot, args.threads, args.duration, args.stock),
+        run_scenario("spread", args.phones, None, args.threads, args.duration, args.stock),
+    ]
+    print(json.dumps(results, indent=2))
+    if any(r["invariant_violations"] for r in results):
+        sys.exit("stock invariants violated")
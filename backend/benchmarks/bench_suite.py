@@ -0,0 +1,212 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from common import (make_app, seed_phones, seed_listing_logs, synthetic_csv, timed, remove_db,
+                    drive_threads, latency_summary)
+from models import db
+from price_matrix import refresh_stale_prices
+
+SECTIONS = ("catalog", "search", "prices", "listing", "import", "load")
+IMPORT_MODES = ("legacy", "stream", "upsert")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ids(rng, size, n):
+    return rng.sample(range(1, size + 1), min(n, size))
+
+
+def bench_catalog(client, size, repeat, full_list_max):
+    cursor = None
+    for _ in range(20):
+        page = client.get("/api/phones?limit=50" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        cursor = page["next_cursor"] or cursor
+    results = {
+        "page_50": timed(lambda: client.get("/api/phones?limit=50").get_data(), repeat),
+        "page_50_after_1000": timed(lambda: client.get(f"/api/phones?limit=50&cursor={cursor}").get_data(), repeat),
+        "page_50_projected": timed(lambda: client.get("/api/phones?limit=50&fields=brand,model_name,base_price")
+                                   .get_data(), repeat),
+        "page_50_with_prices": timed(lambda: client.get("/api/phones?limit=50&prices=1").get_data(), repeat),
+        "filtered_count": timed(lambda: client.get("/api/phones?limit=50&condition=Good&count=1").get_data(), repeat),
+        "tag_all": timed(lambda: client.get("/api/phones?limit=50&tag=camera,5g").get_data(), repeat),
+        "tag_any": timed(lambda: client.get("/api/phones?limit=50&tag=stylus,gaming&tag_match=any")
+                         .get_data(), repeat),
+        "tag_counts": timed(lambda: client.get("/api/tags").get_data(), repeat),
+    }
+    if size <= full_list_max:
+        results["full_list"] = timed(lambda: client.get("/api/phones").get_data(), max(1, repeat // 5))
+    return results
+
+
+def bench_search(client, repeat):
+    return {
+        "ranked": timed(lambda: client.get("/api/search?q=galaxy 256&limit=20").get_data(), repeat),
+        "catalog_filter": timed(lambda: client.get("/api/phones?q=pixel&limit=20").get_data(), repeat),
+        "prefix": timed(lambda: client.get("/api/search?q=red&limit=20").get_data(), repeat),
+    }
+
+
+def bench_prices(client, size, repeat, rng):
+    return {
+        "single": timed(lambda: client.get(f"/api/phones/{rng.randint(1, size)}/price/{rng.choice('XYZ')}")
+                        .get_data(), repeat),
+        "bulk_100": timed(lambda: client.post("/api/prices/bulk?admin=1",
+                                              json={"ids": ids(rng, size, 100)}).get_data(), repeat),
+        "matrix_50": timed(lambda: client.get("/api/prices/matrix?admin=1&ids="
+                                              + ",".join(map(str, ids(rng, size, 50)))).get_data(), repeat),
+    }
+
+
+def bench_listing(client, size, repeat, rng):
+    return {
+        "single": timed(lambda: client.post(f"/list/{rng.randint(1, size)}/{rng.choice('XYZ')}?admin=1")
+                        .get_data(), repeat),
+        "batch_100x3": timed(lambda: client.post("/api/listings/batch?admin=1",
+                                                 json={"phone_ids": ids(rng, size, 100),
+                                                       "platforms": ["X", "Y", "Z"]}).get_data(),
+                             max(1, repeat // 2)),
+    }
+
+
+def bench_import(client, size, rows):
+    results = {}
+    start = size
+    for mode in IMPORT_MODES:
+        if mode == "upsert":
+            # re-send the rows the stream import just created, with new prices
+            body = synthetic_csv(rows, start=start - rows, price_factor=1.1)
+        else:
+            body = synthetic_csv(rows, start=start)
+        query = "" if mode == "legacy" else f"&mode={mode}"
+        began = time.perf_counter()
+        response = client.post(f"/api/bulk_upload?admin=1{query}",
+                               data={"file": (io.BytesIO(body), "phones.csv")},
+                               content_type="multipart/form-data")
+        elapsed = time.perf_counter() - began
+        data = response.get_json()
+        if response.status_code != 200:
+            raise RuntimeError(f"{mode} import failed: {data}")
+        results[mode] = {
+            "rows": rows,
+            "ms": round(elapsed * 1000, 3),
+            "rows_per_s": round(rows / elapsed, 1),
+            "created": data.get("created_count", data.get("inserted_count")),
+            "updated": data.get("updated_count"),
+        }
+        if mode != "upsert":
+            start += rows
+    return results
+
+
+def bench_load(app, size, threads, duration):
+    def catalog_page(client, rng):
+        return client.get("/api/phones?limit=50").status_code
+
+    def search(client, rng):
+        return client.get(f"/api/search?q={rng.choice(['galaxy', 'pixel', 'iphone', 'redmi'])}").status_code
+
+    def price(client, rng):
+        return client.get(f"/api/phones/{rng.randint(1, size)}/price/{rng.choice('XYZ')}").status_code
+
+    def list_phone(client, rng):
+        return client.post(f"/list/{rng.randint(1, size)}/{rng.choice('XYZ')}?admin=1").status_code
+
+    def update(client, rng):
+        return client.put(f"/api/phones/{rng.randint(1, size)}?admin=1",
+                          json={"stock_quantity": rng.randint(0, 40)}).status_code
+
+    operations = [("catalog_page", 30, catalog_page), ("search", 20, search), ("price", 30, price),
+                  ("list_phone", 10, list_phone), ("update", 10, update)]
+    samples, errors = drive_threads(app, operations, threads, duration)
+    total = sum(len(values) for values in samples.values())
+    return {
+        "threads": threads,
+        "ops_per_s": round(total / duration, 1),
+        "errors": errors,
+        "operations": {name: latency_summary(values) for name, values in samples.items()},
+    }
+
+
+def run_size(size, args):
+    rng = random.Random(size)
+    app, db_path = make_app()
+    try:
+        client = app.test_client()
+        seed_started = time.perf_counter()
+        with app.app_context():
+            seed_phones(size)
+            refresh_stale_prices()
+            db.session.commit()
+            seed_listing_logs(size * args.logs_per_phone, size)
+        result = {"phones": size, "logs": size * args.logs_per_phone,
+                  "seed_s": round(time.perf_counter() - seed_started, 2)}
+        if "catalog" in args.sections:
+            result["catalog"] = bench_catalog(client, size, args.repeat, args.full_list_max)
+        if "search" in args.sections:
+            result["search"] = bench_search(client, args.repeat)
+        if "prices" in args.sections:
+            result["prices"] = bench_prices(client, size, args.repeat, rng)
+        if "listing" in args.sections:
+            result["listing"] = bench_listing(client, size, args.repeat, rng)
+        if "load" in args.sections:
+            result["load"] = bench_load(app, size, args.threads, args.duration)
+        if "import" in args.sections:
+            result["import"] = bench_import(client, size, min(size, args.import_rows))
+        return result
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        remove_db(db_path)
+
+
+def run(args):
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": [run_size(size, args) for size in args.sizes],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API benchmark suite; compare runs with compare.py")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="catalog sizes, up to 1000000")
+    parser.add_argument("--sections", default=",".join(SECTIONS))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--logs-per-phone", type=int, default=3)
+    parser.add_argument("--import-rows", type=int, default=10000)
+    parser.add_argument("--full-list-max", type=int, default=100000,
+                        help="skip the unpaginated list above this many phones")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of mixed load per size")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.sections = [s for s in args.sections.split(",") if s]
+    unknown = set(args.sections) - set(SECTIONS)
+    if unknown:
+        sys.exit(f"Unknown sections: {', '.join(sorted(unknown))}")
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
@@ -0,0 +1,180 @@
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app
+from datetime import timedelta
+
+from models import db, Phone, ListingLog, get_ist_now
+
+BRANDS = {
+    "Apple": ["iPhone 12", "iPhone 13", "iPhone 14 Pro", "iPhone 15"],
+    "Samsung": ["Galaxy S21", "Galaxy S23 Ultra", "Galaxy A54", "Galaxy Z Flip5"],
+    "OnePlus": ["11R", "Nord CE 3", "10 Pro"],
+    "Xiaomi": ["13 Pro", "Redmi Note 12", "Poco F5"],
+    "Google": ["Pixel 7a", "Pixel 8", "Pixel 6 Pro"],
+    "Realme": ["GT Neo 3", "11 Pro+", "Narzo 60"],
+}
+CONDITIONS = ["New", "Excellent", "Good", "Fair", "As New", "Usable", "Scrap"]
+STORAGE = ["64GB", "128GB", "256GB", "512GB", "1TB"]
+COLORS = ["Black", "White", "Blue", "Green", "Deep Purple", "Phantom Black", "Charcoal"]
+TAGS = ["flagship", "premium", "camera", "android", "budget", "gaming", "5g", "compact", "stylus"]
+
+SAMPLE_CSV = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "sample_phones.csv"))
+with open(SAMPLE_CSV, newline="", encoding="utf-8") as _sample:
+    CSV_FIELDS = next(csv.reader(_sample))
+
+
+def make_app(db_path=None, **config):
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+        os.close(fd)
+    # repeated identical requests would otherwise be answered by the read cache
+    config.setdefault("CACHE_BACKEND", "none")
+    return create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_path, **config}), db_path
+
+
+def remove_db(db_path):
+    # WAL mode leaves -wal and -shm files next to the database
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def synthetic_phone(rng, seq):
+    brand = rng.choice(list(BRANDS))
+    now = get_ist_now()
+    return {
+        "brand": brand,
+        # the lot number keeps (brand, model, storage, color, condition) unique
+        "model_name": f"{rng.choice(BRANDS[brand])} Lot {seq}",
+        "condition": rng.choice(CONDITIONS),
+        "storage": rng.choice(STORAGE),
+        "color": rng.choice(COLORS),
+        "base_price": round(rng.uniform(50, 90000), 2),
+        "stock_quantity": rng.randint(0, 40),
+        "discontinued": rng.random() < 0.05,
+        "tags": ",".join(rng.sample(TAGS, rng.randint(0, 3))),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def seed_phones(count, batch_size=5000, seed=42):
+    rng = random.Random(seed)
+    table = Phone.__table__
+    for start in range(0, count, batch_size):
+        n = min(batch_size, count - start)
+        db.session.execute(table.insert(), [synthetic_phone(rng, start + i) for i in range(n)])
+        db.session.commit()
+
+
+def synthetic_csv(count, start=0, seed=44, price_factor=1.0):
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for i in range(count):
+        row = synthetic_phone(rng, start + i)
+        row["base_price"] = round(row["base_price"] * price_factor, 2)
+        row["discontinued"] = "true" if row["discontinued"] else "false"
+        writer.writerow(row)
+    return out.getvalue().encode("utf-8")
+
+
+def seed_listing_logs(count, phone_count, batch_size=20000, seed=43, days=365):
+    rng = random.Random(seed)
+    table = ListingLog.__table__
+    start_time = get_ist_now() - timedelta(days=days)
+    step = timedelta(days=days) / max(count, 1)
+    for start in range(0, count, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, count)):
+            success = rng.random() < 0.8
+            price = round(rng.uniform(50, 90000), 2)
+            rows.append({
+                "phone_id": rng.randint(1, phone_count),
+                "platform": rng.choice("XYZ"),
+                "success": success,
+                "message": "Listed" if success else "Rejected",
+                "attempted_price": price,
+                "fee": round(price * 0.1, 2),
+                "created_at": start_time + step * i,
+            })
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "min_ms": round(samples[0] * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95)] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+# operations are (name, weight, fn(client, rng) -> status); 5xx and exceptions count as errors
+def drive_threads(app, operations, threads, duration, seed=1):
+    names = [name for name, _, _ in operations]
+    weights = [weight for _, weight, _ in operations]
+    calls = {name: fn for name, _, fn in operations}
+    samples = {name: [] for name in names}
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def loop(thread_seed):
+        rng = random.Random(thread_seed)
+        client = app.test_client()
+        local = {name: [] for name in names}
+        local_errors = {}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = calls[name](client, rng)
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if isinstance(status, int) and status < 500:
+                local[name].append(elapsed)
+            else:
+                key = f"{name}:{status}"
+                local_errors[key] = local_errors.get(key, 0) + 1
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+            for key, count in local_errors.items():
+                errors[key] = errors.get(key, 0) + count
+
+    pool = [threading.Thread(target=loop, args=(seed * 1000 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return samples, errors
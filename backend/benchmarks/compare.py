@@ -0,0 +1,64 @@
+import argparse
+import json
+import sys
+
+# stat name -> True when larger is better
+COMPARED_STATS = {"p50_ms": False, "rows_per_s": True, "ops_per_s": True}
+
+
+def flatten(value, prefix, out):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in COMPARED_STATS and isinstance(child, (int, float)):
+                out[f"{prefix}/{key}"] = (child, COMPARED_STATS[key])
+            else:
+                flatten(child, f"{prefix}/{key}", out)
+    return out
+
+
+def load_metrics(path):
+    with open(path) as f:
+        report = json.load(f)
+    metrics = {}
+    for result in report["results"]:
+        flatten({k: v for k, v in result.items() if isinstance(v, dict)}, str(result["phones"]), metrics)
+    return report.get("meta", {}), metrics
+
+
+def compare(base, head, threshold):
+    rows = []
+    regressions = []
+    for name in sorted(set(base) & set(head)):
+        (old, higher_is_better), (new, _) = base[name], head[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > threshold else ("improved" if worse < -threshold else "")
+        rows.append((name, old, new, change, flag))
+        if flag == "REGRESSION":
+            regressions.append(name)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two bench_suite.py JSON reports")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change treated as significant")
+    args = parser.parse_args()
+
+    base_meta, base = load_metrics(args.base)
+    head_meta, head = load_metrics(args.head)
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"base {base_meta.get('git')} ({base_meta.get('started_at')}) -> "
+          f"head {head_meta.get('git')} ({head_meta.get('started_at')})")
+    width = max((len(r[0]) for r in rows), default=10)
+    for name, old, new, change, flag in rows:
+        print(f"{name:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>+8.1%}  {flag}")
+    missing = sorted(set(base) ^ set(head))
+    if missing:
+        print(f"{len(missing)} metrics only present in one report")
+    if regressions:
+        print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+        sys.exit(1)
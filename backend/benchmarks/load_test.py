@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from common import seed_phones, remove_db, drive_threads, latency_summary
+from app import create_app
+from models import db, ensure_indexes
+from changes import init_change_log
+from search import init_search_index
+from tags import init_tag_index
+from price_matrix import refresh_stale_prices
+
+SQLITE_TARGETS = {
+    "sqlite-wal": None,
+    "sqlite-rollback": {"journal_mode": "DELETE", "synchronous": "FULL"},
+}
+
+# (name, weight, is_write)
+OPERATIONS = [
+    ("catalog_page", 30, False),
+    ("phone_detail", 30, False),
+    ("price_lookup", 20, False),
+    ("update_stock", 12, True),
+    ("list_phone", 8, True),
+]
+
+
+def app_config(url, pragmas, pool_size, cache="none"):
+    return {
+        "SQLALCHEMY_DATABASE_URI": url,
+        "CACHE_BACKEND": cache,
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": pool_size, "max_overflow": pool_size, "pool_pre_ping": True},
+        "SQLITE_PRAGMAS": pragmas,
+        "JOB_WORKERS": 1,
+    }
+
+
+def prepare(url, pragmas, phones):
+    app = create_app(app_config(url, pragmas, 2))
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            # only point --database-url at a scratch database
+            db.drop_all()
+            db.create_all()
+            ensure_indexes()
+            # the recreated tables lost their triggers
+            init_search_index()
+            init_change_log()
+            init_tag_index()
+        seed_phones(phones)
+        refresh_stale_prices()
+        db.session.commit()
+        db.engine.dispose()
+
+
+def teardown(url):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url, "JOB_WORKERS": 1})
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            db.drop_all()
+        db.engine.dispose()
+
+
+def operations(phones, write_ratio):
+    def catalog_page(client, rng):
+        return client.get("/api/phones?limit=50&fields=brand,model_name,base_price").status_code
+
+    def phone_detail(client, rng):
+        return client.get(f"/api/phones/{rng.randint(1, phones)}").status_code
+
+    def price_lookup(client, rng):
+        return client.get(f"/api/phones/{rng.randint(1, phones)}/price/{rng.choice('XYZ')}").status_code
+
+    def update_stock(client, rng):
+        return client.put(f"/api/phones/{rng.randint(1, phones)}?admin=1",
+                          json={"stock_quantity": rng.randint(0, 40)}).status_code
+
+    def list_phone(client, rng):
+        return client.post(f"/list/{rng.randint(1, phones)}/{rng.choice('XYZ')}?admin=1").status_code
+
+    calls = {"catalog_page": catalog_page, "phone_detail": phone_detail, "price_lookup": price_lookup,
+             "update_stock": update_stock, "list_phone": list_phone}
+    read_total = sum(w for _, w, is_write in OPERATIONS if not is_write)
+    write_total = sum(w for _, w, is_write in OPERATIONS if is_write)
+    return [(name, weight * (write_ratio / write_total if is_write else (1 - write_ratio) / read_total),
+             calls[name]) for name, weight, is_write in OPERATIONS]
+
+
+def worker(url, pragmas, threads, duration, phones, write_ratio, seed, cache):
+    app = create_app(app_config(url, pragmas, threads, cache))
+    samples, errors = drive_threads(app, operations(phones, write_ratio), threads, duration, seed)
+    with app.app_context():
+        db.engine.dispose()
+    return samples, errors
+
+
+def summarize(samples, errors, duration):
+    per_operation = {}
+    total = 0
+    for name, values in samples.items():
+        total += len(values)
+        if values:
+            per_operation[name] = latency_summary(values)
+    return {
+        "ops": total,
+        "ops_per_s": round(total / duration, 1),
+        "errors": errors,
+        "operations": per_operation,
+    }
+
+
+def run_target(name, url, pragmas, args):
+    prepare(url, pragmas, args.phones)
+    try:
+        results = []
+        for workers in args.workers:
+            ctx = get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+                futures = [executor.submit(worker, url, pragmas, args.threads, args.duration,
+                                           args.phones, args.write_ratio, i + 1, args.cache)
+                           for i in range(workers)]
+                samples = {op: [] for op, _, _ in OPERATIONS}
+                errors = {}
+                for future in futures:
+                    part, part_errors = future.result()
+                    for op, values in part.items():
+                        samples[op].extend(values)
+                    for key, count in part_errors.items():
+                        errors[key] = errors.get(key, 0) + count
+            result = summarize(samples, errors, args.duration)
+            result.update({"target": name, "workers": workers, "threads": args.threads, "cache": args.cache})
+            results.append(result)
+        return results
+    finally:
+        teardown(url)
+
+
+def run(args):
+    results = []
+    for name in args.targets:
+        fd, db_path = tempfile.mkstemp(suffix=".db", prefix="load_")
+        os.close(fd)
+        try:
+            results.extend(run_target(name, "sqlite:///" + db_path, SQLITE_TARGETS[name], args))
+        finally:
+            remove_db(db_path)
+    for url in args.database_url:
+        results.extend(run_target(url.split(":", 1)[0], url, None, args))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent read/write load against SQLite and other backends")
+    parser.add_argument("--targets", default="sqlite-wal,sqlite-rollback",
+                        help=f"comma separated, from {', '.join(SQLITE_TARGETS)}")
+    parser.add_argument("--database-url", action="append", default=[],
+                        help="extra backend to test, e.g. postgresql+psycopg2://bench@localhost/bench_scratch "
+                             "(tables are dropped and recreated)")
+    parser.add_argument("--workers", default="1,4", help="app worker processes, comma separated")
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--phones", type=int, default=10000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--cache", default="none", help="CACHE_BACKEND for the app workers (none, memory)")
+    args = parser.parse_args()
+    args.targets = [t for t in args.targets.split(",") if t]
+    args.workers = [int(w) for w in args.workers.split(",")]
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,260 @@
+import pickle
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import Response, current_app, make_response, request
+from db_events import on_tables_written
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHED_TABLES = {"phones", "phone_prices"}
+# query parameters that do not change what a read returns
+IGNORED_PARAMS = {"admin"}
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL = 60
+DEFAULT_MAX_BODY = 1024 * 1024
+
+_caches = weakref.WeakSet()
+
+
+@on_tables_written
+def _invalidate(tables):
+    if tables & CACHED_TABLES:
+        for cache in list(_caches):
+            cache.invalidate()
+
+
+class ReadThroughCache:
+    # entries are written under the generation read before building them, so a
+    # write that commits while a response is being built can never be cached
+
+    backend = None
+
+    def __init__(self, ttl=DEFAULT_TTL, max_body=DEFAULT_MAX_BODY):
+        self.ttl = ttl
+        self.max_body = max_body
+        self._counter_lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0,
+                         "invalidations": 0, "uncacheable": 0}
+
+    def _count(self, name, n=1):
+        with self._counter_lock:
+            self.counters[name] += n
+
+    def generation(self):
+        raise NotImplementedError
+
+    def get(self, key, generation):
+        raise NotImplementedError
+
+    def set(self, key, value, generation):
+        raise NotImplementedError
+
+    def invalidate(self):
+        raise NotImplementedError
+
+    def size(self):
+        return None
+
+    def stats(self):
+        with self._counter_lock:
+            data = dict(self.counters)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0
+        data["backend"] = self.backend
+        data["entries"] = self.size()
+        data["ttl"] = self.ttl
+        return data
+
+    def get_or_load(self, key, load):
+        generation = self.generation()
+        value = self.get(key, generation)
+        if value is None:
+            value = load()
+            self.set(key, value, generation)
+        return value
+
+    def response(self, key, build):
+        generation = self.generation()
+        cached = self.get(key, generation)
+        if cached is not None:
+            body, mimetype = cached
+            return Response(body, mimetype=mimetype)
+
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        if response.is_streamed:
+            response.response = self._tee(key, generation, response.mimetype, response.response)
+        else:
+            self._store_body(key, generation, response.mimetype, response.get_data())
+        return response
+
+    def _store_body(self, key, generation, mimetype, body):
+        if len(body) > self.max_body:
+            self._count("uncacheable")
+            return
+        self.set(key, (body, mimetype), generation)
+
+    def _tee(self, key, generation, mimetype, chunks):
+        parts = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if parts is not None:
+                    size += len(chunk)
+                    if size > self.max_body:
+                        parts = None
+                        self._count("uncacheable")
+                    else:
+                        parts.append(chunk)
+                yield chunk
+            if parts is not None:
+                self.set(key, (b"".join(parts), mimetype), generation)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+
+class MemoryCache(ReadThroughCache):
+    backend = "memory"
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, max_body=DEFAULT_MAX_BODY):
+        super().__init__(ttl, max_body)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key, generation):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+                self._count("expired")
+            if entry is None:
+                self._count("misses")
+                return None
+            self._entries.move_to_end(key)
+        self._count("hits")
+        return entry[1]
+
+    def set(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        self._count("invalidations")
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache(ReadThroughCache):
+    # works with any client exposing get/set/incr (redis-py, fakeredis, valkey);
+    # the generation lives in the server so every app worker sees invalidations
+    backend = "redis"
+
+    def __init__(self, client, prefix="phones:cache:", ttl=DEFAULT_TTL, max_body=DEFAULT_MAX_BODY):
+        super().__init__(ttl, max_body)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key, generation):
+        return f"{self.prefix}{generation}:{key}"
+
+    def generation(self):
+        return int(self.client.get(self.prefix + "generation") or 0)
+
+    def get(self, key, generation):
+        raw = self.client.get(self._key(key, generation))
+        if raw is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return pickle.loads(raw)
+
+    def set(self, key, value, generation):
+        self.client.set(self._key(key, generation), pickle.dumps(value), ex=self.ttl)
+
+    def invalidate(self):
+        # entries of older generations are never read again and expire on their own
+        self.client.incr(self.prefix + "generation")
+        self._count("invalidations")
+
+
+class NullCache(ReadThroughCache):
+    backend = "none"
+
+    def generation(self):
+        return 0
+
+    def get(self, key, generation):
+        self._count("misses")
+        return None
+
+    def set(self, key, value, generation):
+        pass
+
+    def invalidate(self):
+        self._count("invalidations")
+
+
+def create_cache(config):
+    backend = config.get("CACHE_BACKEND") or "memory"
+    ttl = int(config.get("CACHE_TTL") or DEFAULT_TTL)
+    max_body = int(config.get("CACHE_MAX_BODY") or DEFAULT_MAX_BODY)
+    if backend == "memory":
+        return MemoryCache(int(config.get("CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES), ttl, max_body)
+    if backend == "redis":
+        client = config.get("CACHE_REDIS_CLIENT")
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+            client = redis.Redis.from_url(config.get("CACHE_REDIS_URL") or "redis://localhost:6379/0")
+        return RedisCache(client, config.get("CACHE_REDIS_PREFIX") or "phones:cache:", ttl, max_body)
+    if backend == "none":
+        return NullCache(ttl, max_body)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+
+def init_cache(app):
+    cache = create_cache(app.config)
+    app.extensions["read_cache"] = cache
+    _caches.add(cache)
+    return cache
+
+
+def read_cache():
+    return current_app.extensions["read_cache"]
+
+
+def request_cache_key(prefix, *parts):
+    args = sorted((k, v) for k, v in request.args.items(multi=True) if k not in IGNORED_PARAMS)
+    return ":".join([prefix, request.path, urlencode(args), *parts])
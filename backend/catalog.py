@@ -0,0 +1,179 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import func, or_, and_
+from models import db, Phone, format_ist_time
+from utils import sanitize_string
+from search import search_enabled, build_match_query, match_ids_subquery
+from tags import parse_tags, tag_filter
+from facets import apply_facet_filters, apply_price_range, facet_counts
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+PHONE_FIELDS = [
+    "id", "brand", "model_name", "condition", "storage", "color", "base_price",
+    "stock_quantity", "discontinued", "tags", "manual_overrides", "created_at", "updated_at",
+]
+
+SORT_KEYS = {
+    "id": Phone.id,
+    "updated_at": Phone.updated_at,
+    "created_at": Phone.created_at,
+}
+
+PAGINATION_PARAMS = ("limit", "cursor", "fields", "sort", "order", "facets")
+
+
+def _split_tags(value):
+    return [t.strip() for t in value.split(",") if t.strip()] if value else []
+
+
+FIELD_FORMATTERS = {
+    "tags": _split_tags,
+    "manual_overrides": lambda value: value or {},
+    "created_at": format_ist_time,
+    "updated_at": format_ist_time,
+}
+
+
+def wants_pagination(args):
+    return any(param in args for param in PAGINATION_PARAMS)
+
+
+def apply_phone_filters(query, args, facets=True):
+    q = sanitize_string(args.get("q") or "")
+    # substring matching by default; FTS prefix tokens only when asked for, since
+    # "phone" would no longer find "iPhone"
+    match = build_match_query(q) if q and args.get("match") == "fts" and search_enabled() else ""
+    if match:
+        query = query.filter(Phone.id.in_(match_ids_subquery(match)))
+    elif q:
+        query = query.filter(
+            (Phone.model_name.ilike(f"%{q}%")) | (Phone.brand.ilike(f"%{q}%"))
+        )
+    tag_names = parse_tags(args.get("tag"))
+    if tag_names:
+        query = query.filter(tag_filter(tag_names, match_any=args.get("tag_match") == "any"))
+    query = apply_price_range(query, args)
+    if facets:
+        query = apply_facet_filters(query, args)
+    return query
+
+
+def parse_fields(raw):
+    if not raw:
+        return list(PHONE_FIELDS)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PHONE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def parse_limit(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if raw in (None, ""):
+        return default
+    limit = int(raw)
+    if limit <= 0:
+        raise ValueError("limit must be greater than 0")
+    return min(limit, maximum)
+
+
+def encode_cursor(sort, value, phone_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, phone_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, phone_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match sort key")
+    if sort != "id" and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, int(phone_id)
+
+
+def _after_cursor(sort_col, value, phone_id, descending):
+    if sort_col is Phone.id:
+        return Phone.id < phone_id if descending else Phone.id > phone_id
+    if descending:
+        return or_(sort_col < value, and_(sort_col == value, Phone.id < phone_id))
+    return or_(sort_col > value, and_(sort_col == value, Phone.id > phone_id))
+
+
+def count_phones(args):
+    query = apply_phone_filters(db.session.query(func.count(Phone.id)), args)
+    return query.scalar()
+
+
+def phone_facets(args):
+    return facet_counts(apply_phone_filters(db.session.query(Phone.id), args, facets=False), args)
+
+
+def paginate_phones(args, default_order="asc"):
+    sort = args.get("sort") or "id"
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    order = args.get("order") or default_order
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    descending = order == "desc"
+    limit = parse_limit(args.get("limit"))
+    fields = parse_fields(args.get("fields"))
+
+    sort_col = SORT_KEYS[sort]
+    columns = [getattr(Phone, f) for f in fields]
+    if sort in fields:
+        sort_index = fields.index(sort)
+    else:
+        columns.append(sort_col)
+        sort_index = len(columns) - 1
+
+    query = apply_phone_filters(db.session.query(*columns), args)
+    cursor = args.get("cursor")
+    if cursor:
+        value, phone_id = decode_cursor(cursor, sort)
+        query = query.filter(_after_cursor(sort_col, value, phone_id, descending))
+
+    ordering = [sort_col.desc() if descending else sort_col.asc()]
+    if sort != "id":
+        ordering.append(Phone.id.desc() if descending else Phone.id.asc())
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    formatters = [FIELD_FORMATTERS.get(f) for f in fields]
+    items = []
+    for row in rows:
+        item = {}
+        for name, fmt, value in zip(fields, formatters, row):
+            item[name] = fmt(value) if fmt else value
+        items.append(item)
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last[sort_index], last[fields.index("id")])
+
+    page = {
+        "items": items,
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
+    if args.get("facets") == "1":
+        # the facet scan counts the filtered rows anyway
+        page.update(phone_facets(args))
+    elif args.get("count") == "1":
+        page["total"] = count_phones(args)
+    return page
@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from models import db, Phone, PhoneChange
+from serializers import iter_phone_dicts
+from db_events import on_tables_written
+
+CHANGE_TABLE = "phone_changes"
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+STREAM_POLL_SECONDS = 2.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+logger = logging.getLogger(__name__)
+
+# each trigger drops the phone's previous entry, so the log holds the latest change
+# per phone and a sync from seq 0 costs one row per phone, not the full history
+_SQLITE_NOW = "datetime('now', '+5 hours', '+30 minutes')"
+SQLITE_CHANGE_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS {CHANGE_TABLE}_ai AFTER INSERT ON phones BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE phone_id = new.id; "
+    f"INSERT INTO {CHANGE_TABLE}(phone_id, op, changed_at) VALUES (new.id, 'insert', {_SQLITE_NOW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {CHANGE_TABLE}_au AFTER UPDATE ON phones BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE phone_id = new.id; "
+    f"INSERT INTO {CHANGE_TABLE}(phone_id, op, changed_at) VALUES (new.id, 'update', {_SQLITE_NOW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {CHANGE_TABLE}_ad AFTER DELETE ON phones BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE phone_id = old.id; "
+    f"INSERT INTO {CHANGE_TABLE}(phone_id, op, changed_at) VALUES (old.id, 'delete', {_SQLITE_NOW}); END",
+]
+
+# Readers move `since` past every seq they have seen, so seqs must become visible in
+# order. SQLite has a single writer, so that holds already. PostgreSQL draws sequence
+# values as statements run, and a transaction that took a lower seq could commit after
+# a reader skipped past it. There the trigger is deferred to commit time and draws its
+# seq under a transaction-level advisory lock: the lock is held only while committing,
+# so writers still run concurrently and seqs are handed out in commit order.
+POSTGRES_CHANGE_DDL = [
+    f"CREATE OR REPLACE FUNCTION record_phone_change() RETURNS trigger AS $$ "
+    f"DECLARE target integer; BEGIN "
+    f"IF TG_OP = 'DELETE' THEN target := OLD.id; ELSE target := NEW.id; END IF; "
+    f"PERFORM pg_advisory_xact_lock(hashtext('{CHANGE_TABLE}')); "
+    f"DELETE FROM {CHANGE_TABLE} WHERE phone_id = target; "
+    f"INSERT INTO {CHANGE_TABLE}(phone_id, op, changed_at) "
+    f"VALUES (target, lower(TG_OP), now() AT TIME ZONE 'Asia/Kolkata'); "
+    f"RETURN NULL; END $$ LANGUAGE plpgsql",
+    f"DROP TRIGGER IF EXISTS {CHANGE_TABLE}_trigger ON phones",
+    f"CREATE CONSTRAINT TRIGGER {CHANGE_TABLE}_trigger AFTER INSERT OR UPDATE OR DELETE ON phones "
+    f"DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION record_phone_change()",
+]
+
+_EXISTS_SQL = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name",
+    "postgresql": "SELECT 1 FROM pg_trigger WHERE tgname = :name",
+}
+_TRIGGER_NAMES = {"sqlite": f"{CHANGE_TABLE}_ai", "postgresql": f"{CHANGE_TABLE}_trigger"}
+_DDL = {"sqlite": SQLITE_CHANGE_DDL, "postgresql": POSTGRES_CHANGE_DDL}
+
+_changed = threading.Condition()
+
+
+@on_tables_written
+def _wake_streams(tables):
+    if "phones" in tables:
+        with _changed:
+            _changed.notify_all()
+
+
+def init_change_log():
+    dialect = db.engine.dialect.name
+    if dialect not in _DDL:
+        return False
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(_EXISTS_SQL[dialect]), {"name": _TRIGGER_NAMES[dialect]}).first()
+            for statement in _DDL[dialect]:
+                conn.execute(text(statement))
+            if not exists:
+                # phones that predate the log start out as inserts
+                conn.execute(text(
+                    f"INSERT INTO {CHANGE_TABLE}(phone_id, op, changed_at) "
+                    f"SELECT id, 'insert', updated_at FROM phones "
+                    f"WHERE id NOT IN (SELECT phone_id FROM {CHANGE_TABLE}) ORDER BY id"
+                ))
+    except (OperationalError, ProgrammingError) as e:
+        # e.g. a database user without permission to create triggers or functions
+        logger.warning("Change feed disabled, could not create the %s triggers: %s", CHANGE_TABLE, e.orig)
+        return False
+    return True
+
+
+def change_feed_enabled():
+    return has_app_context() and bool(current_app.config.get("CHANGE_FEED"))
+
+
+def latest_seq():
+    return db.session.query(db.func.max(PhoneChange.seq)).scalar() or 0
+
+
+def changes_since(since, limit=DEFAULT_CHANGES_LIMIT):
+    rows = db.session.query(PhoneChange.seq, PhoneChange.phone_id) \
+        .filter(PhoneChange.seq > since).order_by(PhoneChange.seq).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = [row.phone_id for row in rows]
+    phones = {}
+    if ids:
+        phones = {p["id"]: p for p in iter_phone_dicts(Phone.query.filter(Phone.id.in_(ids)))}
+
+    changes = []
+    for seq, phone_id in rows:
+        # report the row as it is now; a phone deleted after this entry was written
+        # has a newer tombstone further along the log
+        phone = phones.get(phone_id)
+        if phone is None:
+            changes.append({"seq": seq, "op": "delete", "id": phone_id})
+        else:
+            changes.append({"seq": seq, "op": "upsert", "id": phone_id, "phone": phone})
+    return {
+        "changes": changes,
+        "next_since": rows[-1].seq if rows else since,
+        "has_more": has_more,
+    }
+
+
+def _event(seq, name, data):
+    return f"id: {seq}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def change_stream(since, duration, poll=STREAM_POLL_SECONDS, keepalive=STREAM_KEEPALIVE_SECONDS):
+    deadline = time.monotonic() + duration
+    last_sent = time.monotonic()
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        page = changes_since(since)
+        # do not hold a read snapshot open while idle
+        db.session.close()
+        for change in page["changes"]:
+            yield _event(change["seq"], "change", change)
+        if page["changes"]:
+            since = page["next_since"]
+            last_sent = time.monotonic()
+            if page["has_more"]:
+                continue
+        elif time.monotonic() - last_sent >= keepalive:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        # woken early by commits in this process, other workers are picked up by polling
+        with _changed:
+            _changed.wait(min(poll, max(0.0, deadline - time.monotonic())))
@@ -0,0 +1,69 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# applied to every new SQLite connection; journal_mode=WAL persists in the file,
+# the rest are per-connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -20000,
+    "mmap_size": 134217728,
+}
+
+ENGINE_OPTION_ENV = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", int),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda value: value.lower() in ("1", "true", "yes")),
+}
+
+
+# insert() variants that support ON CONFLICT
+DIALECT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+
+def dialect_insert(bind, table):
+    return DIALECT_INSERTS[bind.dialect.name](table)
+
+
+def database_url_from_env(default):
+    url = os.environ.get("DATABASE_URL") or default
+    # some hosts still hand out the pre-1.4 scheme
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options_from_env():
+    options = {}
+    for option, (name, parse) in ENGINE_OPTION_ENV.items():
+        value = os.environ.get(name)
+        if value not in (None, ""):
+            options[option] = parse(value)
+    return options
+
+
+def configure_sqlite(engine, busy_timeout_ms=DEFAULT_SQLITE_BUSY_TIMEOUT_MS, pragmas=None):
+    if engine.dialect.name != "sqlite":
+        return False
+    pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+    pragmas["busy_timeout"] = int(busy_timeout_ms)
+    if engine.url.database in (None, "", ":memory:"):
+        pragmas.pop("journal_mode", None)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return True
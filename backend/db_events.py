@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_listeners = []
+_before_commit_hooks = []
+
+
+def on_tables_written(callback):
+    _listeners.append(callback)
+    return callback
+
+
+def before_commit_writes(callback):
+    _before_commit_hooks.append(callback)
+    return callback
+
+
+def _written(session):
+    return session.info.setdefault("written_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    tables = _written(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _written(state.session).add(table.name)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    if not _before_commit_hooks:
+        return
+    # pending ORM changes are only flushed after this event, flush now to see them
+    session.flush()
+    tables = session.info.get("written_tables")
+    if tables:
+        for callback in _before_commit_hooks:
+            callback(session, set(tables))
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session):
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        for callback in _listeners:
+            callback(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("written_tables", None)
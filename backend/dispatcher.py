@@ -0,0 +1,301 @@
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from flask import current_app
+from platform_mock import simulate_listing
+from platforms import registry
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class PlatformError(Exception):
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class PlatformTimeout(PlatformError):
+    pass
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill(self.clock())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, deadline):
+        # waits for a token; False if none would arrive before the deadline
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                # a single probe decides whether the platform is back
+                self._probing = True
+                return True
+            return False
+
+    def cancel(self):
+        # the allowed call was never made
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+def listing_request(phone):
+    if isinstance(phone, dict):
+        return {"base_price": float(phone["base_price"]), "condition": phone["condition"],
+                "tags": phone.get("tags") or ""}
+    return {"base_price": float(phone.base_price), "condition": phone.condition, "tags": phone.tags or ""}
+
+
+class HttpPlatformClient:
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        https = parts.scheme == "https"
+        self.connection_class = http.client.HTTPSConnection if https else http.client.HTTPConnection
+        self._local = threading.local()
+
+    def _connection(self, timeout):
+        # one keep-alive connection per dispatcher thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connection_class(self.host, self.port, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def list(self, platform, listing, timeout, idempotency_key=None):
+        conn = self._connection(timeout)
+        headers = {"Content-Type": "application/json"}
+        if idempotency_key:
+            # a retry after a timeout may follow a request the platform did accept;
+            # the key lets it answer with that listing instead of creating another
+            headers["Idempotency-Key"] = idempotency_key
+        try:
+            conn.request("POST", f"{self.prefix}/platforms/{platform}/listings", body=json.dumps(listing),
+                         headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (socket.timeout, TimeoutError):
+            self._reset()
+            raise PlatformTimeout("timed out")
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            raise PlatformError(f"connection failed: {e}")
+        if response.status != 200:
+            raise PlatformError(f"HTTP {response.status}", retryable=response.status in RETRYABLE_STATUS)
+        try:
+            data = json.loads(body)
+            return bool(data["success"]), str(data["message"]), data.get("price"), data.get("fee")
+        except (ValueError, KeyError, TypeError):
+            raise PlatformError("invalid response", retryable=False)
+
+
+class PlatformLane:
+    # everything that limits calls to one platform
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+        self.executor = ThreadPoolExecutor(max_workers=settings["concurrency"],
+                                           thread_name_prefix=f"dispatch-{name}")
+        self.bucket = TokenBucket(settings["rate"], settings["burst"])
+        self.breaker = CircuitBreaker(settings["failure_threshold"], settings["reset_timeout"])
+        self.counters = dict.fromkeys(("calls", "succeeded", "failed", "retries", "timeouts",
+                                       "rate_limited", "circuit_rejected"), 0)
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, circuit=self.breaker.state, circuit_opened=self.breaker.opened,
+                    settings=dict(self.settings))
+
+
+def _unavailable(platform, reason):
+    return False, f"Platform {platform} unavailable: {reason}", None, None
+
+
+class ListingDispatcher:
+
+    def __init__(self, client, settings=None):
+        self.client = client
+        self.lanes = {name: PlatformLane(name, dict(platform_settings))
+                      for name, platform_settings in (settings or registry.dispatch).items()}
+
+    def _call(self, lane, listing, key):
+        settings = lane.settings
+        # the deadline starts once a worker picks the call up, so a large batch queued
+        # behind the concurrency limit is slowed down, not failed
+        deadline = time.monotonic() + settings["deadline"]
+        lane.count("calls")
+        for attempt in range(settings["retries"] + 1):
+            if not lane.breaker.allow():
+                lane.count("circuit_rejected")
+                return _unavailable(lane.name, "circuit open")
+            if not lane.bucket.acquire(deadline):
+                lane.breaker.cancel()
+                lane.count("rate_limited")
+                return _unavailable(lane.name, "rate limit")
+            timeout = min(settings["timeout"], max(deadline - time.monotonic(), 0.001))
+            try:
+                result = self.client.list(lane.name, listing, timeout, key)
+            except PlatformError as e:
+                lane.breaker.record(False)
+                if isinstance(e, PlatformTimeout):
+                    lane.count("timeouts")
+                delay = min(settings["backoff_max"], settings["backoff"] * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if not e.retryable or attempt == settings["retries"] or time.monotonic() + delay >= deadline:
+                    lane.count("failed")
+                    return _unavailable(lane.name, str(e))
+                lane.count("retries")
+                time.sleep(delay)
+                continue
+            lane.breaker.record(True)
+            lane.count("succeeded")
+            return result
+
+    def submit(self, platform, listing):
+        lane = self.lanes.get(platform)
+        if lane is None:
+            raise ValueError(f"Unknown platform: {platform}")
+        # every attempt of this listing carries the same key
+        return lane.executor.submit(self._call, lane, listing, uuid.uuid4().hex)
+
+    def dispatch(self, calls):
+        # calls are (platform, listing) pairs; results come back in the same order,
+        # an exception in place of an outcome for calls that could not be made
+        futures = []
+        for platform, listing in calls:
+            try:
+                futures.append(self.submit(platform, listing))
+            except ValueError as e:
+                futures.append(e)
+        results = []
+        for future in futures:
+            if isinstance(future, Exception):
+                results.append(future)
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def init_dispatcher(app):
+    url = app.config.get("PLATFORM_API_URL")
+    dispatcher = ListingDispatcher(HttpPlatformClient(url)) if url else None
+    app.extensions["listing_dispatcher"] = dispatcher
+    return dispatcher
+
+
+def listing_dispatcher():
+    return current_app.extensions.get("listing_dispatcher")
+
+
+def platform_outcomes(calls):
+    # calls are (phone, platform) pairs; without a platform API the listings are
+    # evaluated in-process, one after the other, as before
+    dispatcher = listing_dispatcher()
+    if dispatcher is None:
+        outcomes = []
+        for phone, platform in calls:
+            try:
+                outcomes.append(simulate_listing(phone, platform))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+    return dispatcher.dispatch([(platform, listing_request(phone)) for phone, platform in calls])
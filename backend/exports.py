@@ -0,0 +1,76 @@
+import csv
+import io
+from datetime import datetime
+from flask import Response, stream_with_context
+from models import Phone, ListingLog
+from catalog import apply_phone_filters
+from serializers import iter_phone_dicts, iter_log_dicts, ndjson_chunks
+from listing_logs import filter_logs
+from utils import parse_datetime
+
+EXPORT_BATCH_SIZE = 2000
+CSV_CHUNK_ROWS = 1000
+
+PHONE_CSV_COLUMNS = [
+    "id", "brand", "model_name", "condition", "storage", "color", "base_price",
+    "stock_quantity", "discontinued", "tags", "created_at", "updated_at",
+]
+LOG_CSV_COLUMNS = ["id", "phone_id", "platform", "success", "message", "attempted_price", "fee", "created_at"]
+
+
+def _date_range(query, column, args):
+    since = parse_datetime(args.get("since"), "since")
+    until = parse_datetime(args.get("until"), "until")
+    if since:
+        query = query.filter(column >= since)
+    if until:
+        query = query.filter(column < until)
+    return query
+
+
+def phone_export_query(args):
+    query = apply_phone_filters(Phone.query, args)
+    return _date_range(query, Phone.updated_at, args).order_by(Phone.id)
+
+
+def log_export_query(args):
+    return filter_logs(ListingLog.query, args).order_by(ListingLog.id)
+
+
+def _csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _csv_values(query, model, columns):
+    for row in query.with_entities(*[getattr(model, c) for c in columns]).yield_per(EXPORT_BATCH_SIZE):
+        yield [v.isoformat() if isinstance(v, datetime) else v for v in row]
+
+
+def export_response(kind, query, fmt):
+    if kind == "phones":
+        columns, model, iter_dicts = PHONE_CSV_COLUMNS, Phone, iter_phone_dicts
+    else:
+        columns, model, iter_dicts = LOG_CSV_COLUMNS, ListingLog, iter_log_dicts
+
+    if fmt == "csv":
+        body = _csv_chunks(columns, _csv_values(query, model, columns))
+        mimetype, extension = "text/csv", "csv"
+    else:
+        body = ndjson_chunks(iter_dicts(query, batch_size=EXPORT_BATCH_SIZE))
+        mimetype, extension = "application/x-ndjson", "ndjson"
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={kind}.{extension}"
+    return response
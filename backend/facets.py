@@ -0,0 +1,156 @@
+from collections import Counter
+from sqlalchemy import and_, case, func, not_, true
+from models import Phone
+from utils import sanitize_string
+
+VALUE_FACETS = {
+    "brand": Phone.brand,
+    "condition": Phone.condition,
+    "storage": Phone.storage,
+    "color": Phone.color,
+}
+FLAG_FACETS = {
+    "in_stock": Phone.stock_quantity > 0,
+    "discontinued": Phone.discontinued.is_(True),
+}
+FACET_NAMES = list(VALUE_FACETS) + list(FLAG_FACETS)
+# same order as ix_phones_facets
+GROUP_COLUMNS = [Phone.brand, Phone.condition, Phone.storage, Phone.color, Phone.discontinued]
+# upper bounds of the price buckets, the last bucket is open-ended
+PRICE_BUCKETS = [10000, 20000, 30000, 50000, 80000]
+
+_TRUE = ("1", "true", "yes")
+_FALSE = ("0", "false", "no")
+
+
+def parse_values(raw):
+    values = []
+    for value in (raw or "").split(","):
+        value = sanitize_string(value.strip())
+        if value and value not in values:
+            values.append(value)
+    return values
+
+
+def parse_flag(raw, name):
+    if raw in (None, ""):
+        return None
+    if raw.lower() in _TRUE:
+        return True
+    if raw.lower() in _FALSE:
+        return False
+    raise ValueError(f"{name} must be 1 or 0")
+
+
+def parse_price(raw, name):
+    if raw in (None, ""):
+        return None
+    try:
+        price = float(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if price < 0:
+        raise ValueError(f"{name} must not be negative")
+    return price
+
+
+def selected_facets(args):
+    selected = {}
+    for name in VALUE_FACETS:
+        values = parse_values(args.get(name))
+        if values:
+            selected[name] = set(values)
+    for name in FLAG_FACETS:
+        flag = parse_flag(args.get(name), name)
+        if flag is not None:
+            selected[name] = {flag}
+    return selected
+
+
+def apply_price_range(query, args):
+    min_price = parse_price(args.get("min_price"), "min_price")
+    max_price = parse_price(args.get("max_price"), "max_price")
+    if min_price is not None:
+        query = query.filter(Phone.base_price >= min_price)
+    if max_price is not None:
+        query = query.filter(Phone.base_price <= max_price)
+    return query
+
+
+def apply_facet_filters(query, args):
+    for name, values in selected_facets(args).items():
+        if name in VALUE_FACETS:
+            query = query.filter(VALUE_FACETS[name].in_(values))
+        elif True in values:
+            query = query.filter(FLAG_FACETS[name])
+        else:
+            query = query.filter(not_(FLAG_FACETS[name]))
+    return query
+
+
+def _flag_predicate(name, selected):
+    if name not in selected:
+        return true()
+    return FLAG_FACETS[name] if True in selected[name] else not_(FLAG_FACETS[name])
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _price_buckets(total, below):
+    # below[i] counts matches under PRICE_BUCKETS[i]; turn the running counts into buckets
+    bounds = [0] + PRICE_BUCKETS + [None]
+    running = below + [total]
+    buckets = []
+    for i, n in enumerate(running):
+        count = n - (running[i - 1] if i else 0)
+        if count:
+            buckets.append({"min": bounds[i], "max": bounds[i + 1], "count": count})
+    return buckets
+
+
+def facet_counts(base_query, args):
+    # base_query carries every filter except the facet selections. One grouped query
+    # returns the count of each facet combination; a facet's counts then ignore its own
+    # selection, so choosing one brand still shows how many phones the other brands have.
+    # Grouping in ix_phones_facets order lets the database stream the covering index
+    # instead of sorting; in-stock and the price buckets are summed within each group.
+    selected = selected_facets(args)
+    stocked = _flag_predicate("in_stock", selected)
+    rows = base_query.order_by(None).with_entities(
+        *GROUP_COLUMNS, func.count(), _count_if(FLAG_FACETS["in_stock"]),
+        *[_count_if(and_(stocked, Phone.base_price < edge)) for edge in PRICE_BUCKETS],
+    ).group_by(*GROUP_COLUMNS)
+
+    counts = {name: Counter() for name in FACET_NAMES}
+    total = 0
+    below = [0] * len(PRICE_BUCKETS)
+    for brand, condition, storage, color, discontinued, n, n_stocked, *cheaper in rows:
+        values = {"brand": brand, "condition": condition, "storage": storage, "color": color,
+                  "discontinued": bool(discontinued)}
+        if not [name for name, wanted in selected.items() if name != "in_stock" and values[name] not in wanted]:
+            # the price sums already apply the in-stock selection
+            below = [b + c for b, c in zip(below, cheaper)]
+        for in_stock, count in ((True, n_stocked), (False, n - n_stocked)):
+            if not count:
+                continue
+            values["in_stock"] = in_stock
+            missed = [name for name, wanted in selected.items() if values[name] not in wanted]
+            if not missed:
+                total += count
+                for name in FACET_NAMES:
+                    counts[name][values[name]] += count
+            elif len(missed) == 1:
+                counts[missed[0]][values[missed[0]]] += count
+
+    facets = {}
+    for name in FACET_NAMES:
+        wanted = selected.get(name, set())
+        facets[name] = [
+            {"value": value, "count": n, "selected": value in wanted}
+            for value, n in sorted(counts[name].items(), key=lambda item: (-item[1], str(item[0])))
+            if value not in (None, "")
+        ]
+    facets["price"] = _price_buckets(total, below)
+    return {"total": total, "facets": facets}
@@ -0,0 +1,100 @@
+import hashlib
+from flask import request, make_response
+from sqlalchemy import func
+from models import db, Phone, PhonePrice, PhoneChange, IST
+from cache import read_cache, request_cache_key
+from changes import change_feed_enabled
+from serializers import negotiated_mimetype
+
+
+def _stamp(dt):
+    return dt.isoformat() if dt else ""
+
+
+def catalog_version():
+    # Derived from the data instead of a shared counter row, which every phone write
+    # would have to lock. Prices are only ever rewritten, never updated in place, so
+    # their newest timestamp moves on each refresh; phones use the change feed, whose
+    # tombstones also cover deletes, or their row count and newest update without it.
+    prices_at = db.session.query(func.max(PhonePrice.updated_at)).scalar()
+    if change_feed_enabled():
+        row = db.session.query(PhoneChange.seq, PhoneChange.changed_at) \
+            .order_by(PhoneChange.seq.desc()).first()
+        phones_seq, phones_at = row if row else (0, None)
+    else:
+        phones_seq, phones_at = db.session.query(func.count(Phone.id), func.max(Phone.updated_at)).one()
+    modified_at = max((dt for dt in (phones_at, prices_at) if dt is not None), default=None)
+    return f"{phones_seq}:{_stamp(phones_at)}:{_stamp(prices_at)}", modified_at
+
+
+def _as_utc(dt):
+    if dt is None:
+        return None
+    # timestamps are stored as naive IST, HTTP dates compare at second precision
+    return dt.replace(tzinfo=IST, microsecond=0)
+
+
+def conditional_response(seed, modified_at, build):
+    etag = hashlib.sha1(seed.encode("utf-8")).hexdigest()
+    last_modified = _as_utc(modified_at)
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified is not None:
+        not_modified = last_modified <= request.if_modified_since
+
+    if not_modified:
+        response = make_response("", 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    # the same URL can answer in several formats, caches must keep them apart
+    response.vary.add("Accept")
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def _phone_updated_at(phone_id):
+    row = db.session.query(Phone.updated_at).filter(Phone.id == phone_id).first()
+    return (row.updated_at,) if row else ()
+
+
+def price_response(phone_id, platform, build):
+    # keyed by the stored row's timestamp, or the phone's when nothing is stored, so a
+    # price another worker rewrote is never served from this process's cache
+    row = db.session.query(PhonePrice.updated_at) \
+        .filter(PhonePrice.phone_id == phone_id, PhonePrice.platform == platform).first() \
+        or _phone_updated_at(phone_id)
+    if not row:
+        return make_response(build())
+    return read_cache().response(f"price:{phone_id}:{platform}:{_stamp(row[0])}", build)
+
+
+def catalog_response(build):
+    # the version is read from the database on every request: a per-process cache would
+    # keep serving a version another worker already moved past. Only the slower count
+    # used without the change feed goes through a cache that every worker invalidates.
+    cache = read_cache()
+    if cache.backend == "redis" and not change_feed_enabled():
+        version, modified_at = cache.get_or_load("catalog:version", catalog_version)
+    else:
+        version, modified_at = catalog_version()
+    mimetype = negotiated_mimetype()
+    key = request_cache_key("catalog", mimetype, version)
+    return conditional_response(f"catalog:{version}:{mimetype}:{request.full_path}", modified_at,
+                                lambda: cache.response(key, build))
+
+
+def phone_response(phone_id, build):
+    cache = read_cache()
+    row = _phone_updated_at(phone_id)
+    if not row:
+        return make_response(build())
+    updated_at = row[0]
+    stamp = _stamp(updated_at)
+    return conditional_response(f"phone:{phone_id}:{stamp}", updated_at,
+                                lambda: cache.response(f"phone:{phone_id}:{stamp}", build))
@@ -0,0 +1,176 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, Job, get_ist_now
+
+PROGRESS_FIELDS = ("processed", "succeeded", "failed")
+ACTIVE_STATUSES = ("queued", "running")
+DEFAULT_HEARTBEAT_SECONDS = 10
+DEFAULT_STALE_SECONDS = 60
+STALE_MESSAGE = "Interrupted: the worker running it stopped responding"
+
+logger = logging.getLogger(__name__)
+
+_live_progress = {}
+_lock = threading.Lock()
+
+
+def job_owner():
+    # read at call time, a pre-forking server imports this module before forking
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobHeartbeat:
+    # refreshes heartbeat_at of this process's queued and running jobs; the thread
+    # only runs while there are any
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.jobs = set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add(self, job_id):
+        with self._lock:
+            self.jobs.add(job_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="job-heartbeat", daemon=True)
+                self._thread.start()
+
+    def discard(self, job_id):
+        with self._lock:
+            self.jobs.discard(job_id)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                job_ids = list(self.jobs)
+                if not job_ids:
+                    self._thread = None
+                    return
+            with self.app.app_context():
+                try:
+                    Job.query.filter(Job.id.in_(job_ids), Job.owner == job_owner()) \
+                        .update({"heartbeat_at": get_ist_now()}, synchronize_session=False)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Could not refresh job heartbeats")
+
+
+def _stale_cutoff(app):
+    stale_seconds = float(app.config.get("JOB_STALE_SECONDS", DEFAULT_STALE_SECONDS))
+    return get_ist_now() - timedelta(seconds=stale_seconds)
+
+
+def fail_stale_jobs(cutoff, job_id=None):
+    # only jobs nobody has vouched for since the cutoff: other workers may be running the
+    # rest; jobs written before heartbeats existed fall back to their creation time
+    query = Job.query.filter(Job.status.in_(ACTIVE_STATUSES),
+                             func.coalesce(Job.heartbeat_at, Job.created_at) < cutoff)
+    if job_id is not None:
+        query = query.filter(Job.id == job_id)
+    failed = query.update({"status": "failed", "message": STALE_MESSAGE, "finished_at": get_ist_now()},
+                          synchronize_session=False)
+    db.session.commit()
+    return failed
+
+
+def init_jobs(app):
+    workers = int(app.config.get("JOB_WORKERS", 2))
+    app.extensions["job_executor"] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+    app.extensions["job_heartbeat"] = JobHeartbeat(
+        app, float(app.config.get("JOB_HEARTBEAT_SECONDS", DEFAULT_HEARTBEAT_SECONDS)))
+    with app.app_context():
+        fail_stale_jobs(_stale_cutoff(app))
+
+
+def submit_job(kind, fn, *args, **kwargs):
+    job = Job(kind=kind, status="queued", owner=job_owner(), heartbeat_at=get_ist_now())
+    db.session.add(job)
+    db.session.commit()
+    app = current_app._get_current_object()
+    app.extensions["job_heartbeat"].add(job.id)
+    app.extensions["job_executor"].submit(_run_job, app, job.id, fn, args, kwargs)
+    return job
+
+
+def get_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return None
+    cutoff = _stale_cutoff(current_app)
+    if job.status in ACTIVE_STATUSES and (job.heartbeat_at or job.created_at) < cutoff:
+        # its worker is gone; nothing else would ever finish it
+        fail_stale_jobs(cutoff, job_id)
+        job = db.session.get(Job, job_id, populate_existing=True)
+    data = job.to_dict()
+    with _lock:
+        live = _live_progress.get(job_id)
+        if live and job.status == "running":
+            data.update(live)
+    return data
+
+
+def _progress_reporter(job_id):
+    def report(update):
+        with _lock:
+            live = _live_progress.setdefault(job_id, {})
+            for field in PROGRESS_FIELDS:
+                if field in update:
+                    live[field] = update[field]
+    return report
+
+
+def _claim(job_id, from_status, values):
+    # status only moves forward from what this process expects; a job another worker
+    # already declared failed stays failed
+    claimed = Job.query.filter(Job.id == job_id, Job.status == from_status, Job.owner == job_owner()) \
+        .update(values, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def _run_job(app, job_id, fn, args, kwargs):
+    heartbeat = app.extensions["job_heartbeat"]
+    with app.app_context():
+        try:
+            now = get_ist_now()
+            if not _claim(job_id, "queued", {"status": "running", "started_at": now, "heartbeat_at": now}):
+                return
+            values = {}
+            try:
+                result = fn(_progress_reporter(job_id), *args, **kwargs) or {}
+            except Exception as e:
+                db.session.rollback()
+                values.update(status="failed", message=str(e)[:500])
+            else:
+                values.update(status="succeeded", errors=result.pop("errors", None), result=result)
+            finally:
+                with _lock:
+                    live = _live_progress.pop(job_id, {})
+
+            values.update({field: live[field] for field in PROGRESS_FIELDS if field in live})
+            values["finished_at"] = get_ist_now()
+            if not _claim(job_id, "running", values):
+                logger.warning("Job %s finished after it was marked failed, its outcome is dropped", job_id)
+        finally:
+            heartbeat.discard(job_id)
+
+
+def spool_upload(f):
+    path = os.path.join(current_app.config.get("JOB_UPLOAD_DIR") or current_app.instance_path, "uploads")
+    os.makedirs(path, exist_ok=True)
+    fd, filename = tempfile.mkstemp(suffix=".csv", dir=path)
+    with os.fdopen(fd, "wb") as out:
+        f.save(out)
+    return filename
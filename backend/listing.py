@@ -0,0 +1,180 @@
+from models import db, Phone, ListingLog
+from dispatcher import platform_outcomes
+from pricing import calculate_platform_price
+from price_matrix import refresh_phone_prices
+from stock import reserve_stock, reserve_stock_batch, release_stock
+
+OUT_OF_STOCK = "Cannot list: out of stock"
+
+
+def _log_out_of_stock(phone_id, platform):
+    db.session.add(ListingLog(phone_id=phone_id, platform=platform, success=False, message=OUT_OF_STOCK))
+    db.session.commit()
+    return {"success": False, "message": OUT_OF_STOCK}, 400
+
+
+def list_phone_on_platform(phone, platform, override_price=None, quantity=1):
+    if phone.stock_quantity < quantity:
+        return _log_out_of_stock(phone.id, platform)
+
+    try:
+        if override_price:
+            try:
+                override_price = float(override_price)
+                overrides = dict(phone.manual_overrides or {})
+                overrides[platform] = override_price
+                phone.manual_overrides = overrides
+                db.session.flush()
+                refresh_phone_prices([phone.id])
+                db.session.commit()
+            except (ValueError, TypeError):
+                return {"success": False, "message": "Invalid override price"}, 400
+
+        # the stock check above can race with other listings, the conditional update cannot;
+        # the units are held before the platform is asked, so it never lists unsold stock twice
+        if not reserve_stock(phone.id, platform, quantity):
+            return _log_out_of_stock(phone.id, platform)
+        db.session.commit()
+
+        override = (phone.manual_overrides or {}).get(platform)
+        if override:
+            final, fee = calculate_platform_price(phone.base_price, platform)
+            msg = f"Listed with manual override ${override:.2f} on {platform}"
+            payload = {"success": True, "message": msg, "price": override, "override": True}
+        else:
+            outcome, = platform_outcomes([(phone, platform)])
+            if isinstance(outcome, Exception) or not outcome[0]:
+                release_stock(phone.id, platform, quantity)
+                db.session.commit()
+            if isinstance(outcome, Exception):
+                raise outcome
+            success, msg, final_price, fee = outcome
+            payload = {"success": success, "message": msg, "price": final_price, "fee": fee, "override": False}
+
+        if payload["success"]:
+            payload["reserved"] = quantity
+
+        log = ListingLog(phone_id=phone.id, platform=platform, success=payload["success"],
+                         message=msg, attempted_price=payload["price"], fee=fee)
+        db.session.add(log)
+        db.session.commit()
+        return payload, (200 if payload["success"] else 400)
+
+    except Exception as e:
+        db.session.rollback()
+        return {"success": False, "message": str(e)}, 500
+
+
+def list_phone_job(progress, phone_id, platform, override_price=None, quantity=1):
+    phone = db.session.get(Phone, phone_id)
+    if phone is None:
+        raise ValueError(f"Phone {phone_id} not found")
+    payload, status = list_phone_on_platform(phone, platform, override_price, quantity)
+    progress({"processed": 1, "succeeded": int(payload["success"]), "failed": int(not payload["success"])})
+    return dict(payload, status_code=status)
+
+
+LISTING_COLUMNS = [Phone.id, Phone.base_price, Phone.condition, Phone.tags,
+                   Phone.stock_quantity, Phone.manual_overrides]
+
+
+def needs_platform(phone, platform):
+    return phone["stock_quantity"] > 0 and not (phone["manual_overrides"] or {}).get(platform)
+
+
+def evaluate_listing(phone, platform, outcome=None):
+    if phone["stock_quantity"] <= 0:
+        return {"success": False, "message": OUT_OF_STOCK}, {}
+
+    override = (phone["manual_overrides"] or {}).get(platform)
+    if override:
+        final, fee = calculate_platform_price(phone["base_price"], platform)
+        msg = f"Listed with manual override ${override:.2f} on {platform}"
+        return ({"success": True, "message": msg, "price": override, "override": True},
+                {"attempted_price": override, "fee": fee})
+
+    if outcome is None:
+        outcome, = platform_outcomes([(phone, platform)])
+    if isinstance(outcome, Exception):
+        raise outcome
+    success, msg, final_price, fee = outcome
+    return ({"success": success, "message": msg, "price": final_price, "fee": fee, "override": False},
+            {"attempted_price": final_price, "fee": fee})
+
+
+def list_phones_batch(query, platforms, phone_ids=None):
+    phones = [dict(zip(("id", "base_price", "condition", "tags", "stock_quantity", "manual_overrides"), row))
+              for row in query.with_entities(*LISTING_COLUMNS).order_by(Phone.id)]
+
+    by_id = {phone["id"]: phone for phone in phones}
+    settled = {}
+    # stock read above may be stale; only the conditional decrements decide who gets a unit,
+    # and they run before any platform is called so a unit is never listed twice
+    wanted = {phone["id"]: list(platforms) for phone in phones if phone["stock_quantity"] > 0}
+    while wanted:
+        granted = reserve_stock_batch(wanted)
+        db.session.commit()
+
+        # every platform call goes out at once; the dispatcher applies the per-platform limits
+        calls = [(by_id[phone_id], platform) for phone_id in sorted(wanted) for platform in wanted[phone_id]
+                 if (phone_id, platform) in granted and needs_platform(by_id[phone_id], platform)]
+        outcomes = dict(zip(((phone["id"], platform) for phone, platform in calls), platform_outcomes(calls)))
+
+        released = set()
+        for phone_id, platform in granted:
+            try:
+                settled[phone_id, platform] = evaluate_listing(by_id[phone_id], platform,
+                                                               outcomes.get((phone_id, platform)))
+                success = settled[phone_id, platform][0]["success"]
+            except Exception as e:
+                settled[phone_id, platform] = e
+                success = False
+            if not success:
+                release_stock(phone_id, platform, 1)
+                released.add(phone_id)
+        # a unit the platform turned down goes to the platforms that found no stock
+        wanted = {phone_id: rest for phone_id in released
+                  if (rest := [p for p in wanted[phone_id] if (phone_id, p) not in settled])}
+
+    results = []
+    logs = []
+    for phone in phones:
+        for platform in platforms:
+            outcome = settled.get((phone["id"], platform))
+            if isinstance(outcome, Exception):
+                results.append({"phone_id": phone["id"], "platform": platform,
+                                "success": False, "message": str(outcome)})
+                continue
+            if outcome is None:
+                result, priced = {"success": False, "message": OUT_OF_STOCK}, {}
+            else:
+                result, priced = outcome
+                if result["success"]:
+                    result["reserved"] = 1
+            logs.append(dict(priced, phone_id=phone["id"], platform=platform,
+                             success=result["success"], message=result["message"]))
+            results.append(dict(result, phone_id=phone["id"], platform=platform))
+
+    if phone_ids:
+        found = {phone["id"] for phone in phones}
+        for phone_id in phone_ids:
+            if phone_id not in found:
+                for platform in platforms:
+                    results.append({"phone_id": phone_id, "platform": platform,
+                                    "success": False, "message": "Phone not found"})
+
+    if logs:
+        # out-of-stock rows have no price; keep the executemany parameter sets uniform
+        for log in logs:
+            log.setdefault("attempted_price", None)
+            log.setdefault("fee", None)
+        db.session.execute(ListingLog.__table__.insert(), logs)
+    db.session.commit()
+    return results
+
+
+def list_phones_batch_job(progress, phone_ids, platforms):
+    results = list_phones_batch(Phone.query.filter(Phone.id.in_(phone_ids)), platforms, phone_ids)
+    succeeded = sum(1 for r in results if r["success"])
+    progress({"processed": len(results), "succeeded": succeeded, "failed": len(results) - succeeded})
+    return {"results": results}
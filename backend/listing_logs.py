@@ -0,0 +1,66 @@
+from sqlalchemy import or_, and_
+from models import ListingLog
+from catalog import parse_limit, encode_cursor, decode_cursor
+from utils import parse_datetime
+from serializers import iter_log_dicts
+
+DEFAULT_LOG_LIMIT = 200
+LOG_PAGINATION_PARAMS = ("limit", "cursor")
+
+
+def wants_log_pagination(args):
+    return any(param in args for param in LOG_PAGINATION_PARAMS)
+
+
+def filter_logs(query, args):
+    if args.get("platform"):
+        query = query.filter(ListingLog.platform == args["platform"])
+    if args.get("phone_id"):
+        query = query.filter(ListingLog.phone_id == int(args["phone_id"]))
+    if args.get("success") in ("0", "1"):
+        query = query.filter(ListingLog.success.is_(args["success"] == "1"))
+    since = parse_datetime(args.get("since"), "since")
+    until = parse_datetime(args.get("until"), "until")
+    if since:
+        query = query.filter(ListingLog.created_at >= since)
+    if until:
+        query = query.filter(ListingLog.created_at < until)
+    return query
+
+
+def newest_logs(args, limit=DEFAULT_LOG_LIMIT):
+    query = filter_logs(ListingLog.query, args)
+    return query.order_by(ListingLog.created_at.desc(), ListingLog.id.desc()).limit(limit)
+
+
+def paginate_logs(args, phone_id=None):
+    limit = parse_limit(args.get("limit"))
+    query = filter_logs(ListingLog.query, args)
+    if phone_id is not None:
+        query = query.filter(ListingLog.phone_id == phone_id)
+
+    cursor = args.get("cursor")
+    if cursor:
+        created_at, log_id = decode_cursor(cursor, "created_at")
+        query = query.filter(or_(
+            ListingLog.created_at < created_at,
+            and_(ListingLog.created_at == created_at, ListingLog.id < log_id),
+        ))
+
+    rows = query.order_by(ListingLog.created_at.desc(), ListingLog.id.desc()) \
+        .with_entities(ListingLog.id, ListingLog.created_at).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    if rows:
+        page_ids = [row.id for row in rows]
+        by_id = {item["id"]: item for item in iter_log_dicts(ListingLog.query.filter(ListingLog.id.in_(page_ids)))}
+        items = [by_id[log_id] for log_id in page_ids]
+
+    return {
+        "items": items,
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": encode_cursor("created_at", rows[-1].created_at, rows[-1].id) if has_more else None,
+    }
@@ -0,0 +1,237 @@
+import gzip
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import select, func, cast, case, Date
+from models import db, ListingLog, ListingLogDaily, get_ist_now
+from database import dialect_insert
+from serializers import dumps
+from utils import parse_datetime
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_RETENTION_BATCH = 5000
+DEFAULT_SUMMARY_LIMIT = 200
+ARCHIVE_PREFIX = "listing_logs-"
+
+logs = ListingLog.__table__
+daily = ListingLogDaily.__table__
+
+LOG_ARCHIVE_COLUMNS = [logs.c.id, logs.c.phone_id, logs.c.platform, logs.c.success, logs.c.message,
+                       logs.c.attempted_price, logs.c.fee, logs.c.created_at]
+TOTAL_COLUMNS = ("attempts", "successes", "attempted_price_total", "listed_price_total", "fee_total")
+
+
+def retention_cutoff(retention_days, now=None):
+    # whole days only, so a day is either fully rolled up or still fully raw
+    today = (now or get_ist_now()).date()
+    return datetime.combine(today - timedelta(days=retention_days), time.min)
+
+
+def _archive_path(archive_dir, day):
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{day.isoformat()}.ndjson.gz")
+
+
+def _write_archive(archive_dir, rows):
+    by_day = defaultdict(list)
+    for row in rows:
+        by_day[row.created_at.date()].append(row)
+    paths = []
+    for day, day_rows in by_day.items():
+        path = _archive_path(archive_dir, day)
+        lines = "".join(dumps({**row._asdict(), "created_at": row.created_at.isoformat()}) + "\n"
+                        for row in day_rows)
+        # every batch appends a gzip member; readers see one continuous stream
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                out.write(lines.encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        paths.append(path)
+    return paths
+
+
+def _rollup_rows(rows):
+    totals = defaultdict(lambda: dict.fromkeys(TOTAL_COLUMNS, 0))
+    for row in rows:
+        entry = totals[(row.created_at.date(), row.phone_id, row.platform)]
+        entry["attempts"] += 1
+        entry["attempted_price_total"] += row.attempted_price or 0
+        if row.success:
+            entry["successes"] += 1
+            entry["listed_price_total"] += row.attempted_price or 0
+            entry["fee_total"] += row.fee or 0
+    return [{"day": day, "phone_id": phone_id, "platform": platform, **entry}
+            for (day, phone_id, platform), entry in totals.items()]
+
+
+def _add_rollups(session, rows):
+    insert = dialect_insert(session.get_bind(), daily)
+    insert = insert.on_conflict_do_update(
+        index_elements=["day", "phone_id", "platform"],
+        set_={name: daily.c[name] + insert.excluded[name] for name in TOTAL_COLUMNS},
+    )
+    session.execute(insert, _rollup_rows(rows))
+
+
+def _delete_logs(ids):
+    delete = logs.delete().where(logs.c.id.in_(ids))
+    if db.session.get_bind().dialect.delete_returning:
+        rows = db.session.execute(delete.returning(*LOG_ARCHIVE_COLUMNS)).all()
+        return sorted(rows, key=lambda row: (row.created_at, row.id))
+    rows = db.session.execute(
+        select(*LOG_ARCHIVE_COLUMNS).where(logs.c.id.in_(ids)).order_by(logs.c.created_at, logs.c.id)
+    ).all()
+    if db.session.execute(delete).rowcount != len(rows):
+        # part of the batch went to a concurrent run; redo it from what is left
+        db.session.rollback()
+        return _delete_logs(ids)
+    return rows
+
+
+def archive_logs(archive_dir, retention_days=DEFAULT_RETENTION_DAYS, batch_size=DEFAULT_RETENTION_BATCH,
+                 progress=None):
+    # Each batch deletes, archives and rolls up the oldest rows in one short transaction,
+    # so writers are never blocked for long. Rollups are built from the rows this run
+    # actually deleted and commit with the delete, so concurrent runs that pick the same
+    # batch never count a row twice; a crash between writing a file and committing can
+    # repeat a batch in the archive, never in the summaries.
+    cutoff = retention_cutoff(retention_days)
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    batches = 0
+    files = set()
+    while True:
+        ids = db.session.execute(
+            select(logs.c.id).where(logs.c.created_at < cutoff)
+            .order_by(logs.c.created_at, logs.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        rows = _delete_logs(ids)
+        if not rows:
+            # another run took the whole batch
+            db.session.rollback()
+            continue
+        files.update(_write_archive(archive_dir, rows))
+        _add_rollups(db.session, rows)
+        db.session.commit()
+        archived += len(rows)
+        batches += 1
+        if progress:
+            progress({"processed": archived})
+    return {
+        "cutoff": cutoff.isoformat(),
+        "archived": archived,
+        "batches": batches,
+        "files": sorted(os.path.basename(path) for path in files),
+    }
+
+
+def archive_logs_job(progress, archive_dir, retention_days, batch_size):
+    result = archive_logs(archive_dir, retention_days, batch_size, progress)
+    progress({"processed": result["archived"], "succeeded": result["archived"]})
+    return result
+
+
+def delete_phone_logs(phone_id):
+    # part of the caller's transaction, so the history goes if and only if the phone does
+    db.session.execute(logs.delete().where(logs.c.phone_id == phone_id))
+    db.session.execute(daily.delete().where(daily.c.phone_id == phone_id))
+
+
+def _log_day(column):
+    # CAST(... AS DATE) keeps only the year on SQLite
+    if db.engine.dialect.name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def _raw_daily_query(args):
+    day = _log_day(logs.c.created_at).label("day")
+    succeeded = logs.c.success.is_(True)
+    query = select(
+        day, logs.c.phone_id, logs.c.platform,
+        func.count().label("attempts"),
+        _sum_if(succeeded, 1).label("successes"),
+        func.coalesce(func.sum(logs.c.attempted_price), 0).label("attempted_price_total"),
+        _sum_if(succeeded, logs.c.attempted_price).label("listed_price_total"),
+        _sum_if(succeeded, logs.c.fee).label("fee_total"),
+    ).group_by(day, logs.c.phone_id, logs.c.platform)
+    since = parse_datetime(args.get("since"), "since")
+    until = parse_datetime(args.get("until"), "until")
+    if since:
+        query = query.where(logs.c.created_at >= since)
+    if until:
+        query = query.where(logs.c.created_at < until)
+    return _summary_filters(query, logs, args), day
+
+
+def _rollup_query(args):
+    query = select(daily.c.day, daily.c.phone_id, daily.c.platform, *[daily.c[name] for name in TOTAL_COLUMNS])
+    since = parse_datetime(args.get("since"), "since")
+    until = parse_datetime(args.get("until"), "until")
+    # summaries cover whole days, so partial days at either end are included
+    if since:
+        query = query.where(daily.c.day >= since.date())
+    if until:
+        query = query.where(daily.c.day <= (until - timedelta(microseconds=1)).date())
+    return _summary_filters(query, daily, args), daily.c.day
+
+
+def _summary_filters(query, table, args):
+    if args.get("platform"):
+        query = query.where(table.c.platform == args["platform"])
+    if args.get("phone_id"):
+        query = query.where(table.c.phone_id == int(args["phone_id"]))
+    return query
+
+
+def _day_key(value):
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def daily_log_summary(args, limit=DEFAULT_SUMMARY_LIMIT):
+    # newest days first, from the rollups for archived days and from the raw rows for
+    # the rest; taking `limit` rows from each side is enough to merge the newest `limit`
+    merged = {}
+    for query, day in (_raw_daily_query(args), _rollup_query(args)):
+        ordered = query.order_by(day.desc(), query.selected_columns.phone_id, query.selected_columns.platform)
+        for row in db.session.execute(ordered.limit(limit)):
+            key = (_day_key(row.day), row.phone_id, row.platform)
+            entry = merged.setdefault(key, dict.fromkeys(TOTAL_COLUMNS, 0))
+            for name in TOTAL_COLUMNS:
+                entry[name] += getattr(row, name) or 0
+
+    items = []
+    keys = sorted(merged, key=lambda k: (k[1], k[2]))
+    keys.sort(key=lambda k: k[0], reverse=True)
+    for day, phone_id, platform in keys[:limit]:
+        entry = merged[(day, phone_id, platform)]
+        attempts, successes = entry["attempts"], entry["successes"]
+        items.append({
+            "day": day,
+            "phone_id": phone_id,
+            "platform": platform,
+            "attempts": attempts,
+            "successes": successes,
+            "avg_attempted_price": round(entry["attempted_price_total"] / attempts, 2) if attempts else None,
+            "avg_listed_price": round(entry["listed_price_total"] / successes, 2) if successes else None,
+            "avg_fee": round(entry["fee_total"] / successes, 2) if successes else None,
+        })
+    return items
+
+
+def platform_rollup_totals():
+    rows = db.session.query(
+        ListingLogDaily.platform,
+        func.sum(ListingLogDaily.attempts),
+        func.sum(ListingLogDaily.successes),
+        func.sum(ListingLogDaily.fee_total),
+        func.sum(ListingLogDaily.listed_price_total),
+    ).group_by(ListingLogDaily.platform).all()
+    return {platform: (attempts or 0, successes or 0, fees or 0, prices or 0)
+            for platform, attempts, successes, fees, prices in rows}
@@ -0,0 +1,238 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from contextvars import ContextVar
+from flask import Response, current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+DEFAULT_SLOW_QUERY_MS = 200
+PROFILE_LINES = 40
+
+# SQL stats of the request running in this context; None outside requests
+_request_sql = ContextVar("request_sql", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestSQL:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.sql_queries = {}
+        self.sql_seconds = {}
+        self.queries_per_request = {}
+        self.slow_queries = 0
+        self.commits = Histogram(LATENCY_BUCKETS)
+
+    def record_request(self, endpoint, method, status, seconds, sql):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((endpoint, method), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.sql_queries[endpoint] = self.sql_queries.get(endpoint, 0) + sql.queries
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql.seconds
+            self.queries_per_request.setdefault(endpoint, Histogram(QUERY_COUNT_BUCKETS)).observe(sql.queries)
+
+    def record_query(self, statement, seconds):
+        stats = _request_sql.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_queries += 1
+            logger.warning("Slow query (%.1f ms): %s", seconds * 1000, " ".join(statement.split())[:500])
+
+    def record_commit(self, seconds):
+        with self._lock:
+            self.commits.observe(seconds)
+
+    def _histogram_lines(self, name, labels, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels + [('le', '+Inf')])} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return lines
+
+    def render(self, extra=None):
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Requests by endpoint, method and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = [("endpoint", endpoint), ("method", method), ("status", status)]
+                lines.append(f"http_requests_total{_labels(labels)} {count}")
+
+            lines += ["# HELP http_request_duration_seconds Request latency including the streamed body.",
+                      "# TYPE http_request_duration_seconds histogram"]
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines += self._histogram_lines("http_request_duration_seconds",
+                                               [("endpoint", endpoint), ("method", method)], histogram)
+
+            lines += ["# HELP db_queries_total SQL statements executed while serving requests.",
+                      "# TYPE db_queries_total counter"]
+            for endpoint, count in sorted(self.sql_queries.items()):
+                lines.append(f"db_queries_total{_labels([('endpoint', endpoint)])} {count}")
+
+            lines += ["# HELP db_query_seconds_total Time spent in SQL while serving requests.",
+                      "# TYPE db_query_seconds_total counter"]
+            for endpoint, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f"db_query_seconds_total{_labels([('endpoint', endpoint)])} {seconds}")
+
+            lines += ["# HELP db_queries_per_request SQL statements per request.",
+                      "# TYPE db_queries_per_request histogram"]
+            for endpoint, histogram in sorted(self.queries_per_request.items()):
+                lines += self._histogram_lines("db_queries_per_request", [("endpoint", endpoint)], histogram)
+
+            lines += ["# HELP db_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+                      "# TYPE db_slow_queries_total counter",
+                      f"db_slow_queries_total {self.slow_queries}",
+                      "# HELP db_commit_duration_seconds Session commit time, including flush and commit hooks.",
+                      "# TYPE db_commit_duration_seconds histogram"]
+            lines += self._histogram_lines("db_commit_duration_seconds", [], self.commits)
+
+        for name, (kind, value) in sorted((extra or {}).items()):
+            if value is None:
+                continue
+            lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_start(session):
+    session.info["commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_end(session):
+    started = session.info.pop("commit_start", None)
+    if started is not None and has_app_context():
+        metrics = current_app.extensions.get("metrics")
+        if metrics is not None:
+            metrics.record_commit(time.perf_counter() - started)
+
+
+def _profile_response(profiler, response, started):
+    body_size = len(response.get_data())
+    profiler.disable()
+    sql = g.request_sql
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(request.args.get("profile_sort") or "cumulative") \
+        .print_stats(PROFILE_LINES)
+    return jsonify({
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "body_bytes": body_size,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "sql_queries": sql.queries,
+        "sql_ms": round(sql.seconds * 1000, 3),
+        "profile": out.getvalue(),
+    })
+
+
+def init_metrics(app, engine, is_admin):
+    metrics = Metrics(int(app.config.get("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)))
+    app.extensions["metrics"] = metrics
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _query_start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _query_end(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        metrics.record_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _query_failed(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @app.before_request
+    def _start_request():
+        g.request_started = time.perf_counter()
+        g.request_sql = RequestSQL()
+        _request_sql.set(g.request_sql)
+        g.profiler = None
+        if request.args.get("profile") == "1" and is_admin():
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        if g.get("profiler") is not None:
+            return _profile_response(g.profiler, response, started)
+
+        endpoint = request.endpoint or "unmatched"
+        method = request.method
+        status = response.status_code
+        sql = g.request_sql
+
+        def finish():
+            metrics.record_request(endpoint, method, status, time.perf_counter() - started, sql)
+
+        if response.is_streamed:
+            # rows are read while the body streams, count them once it is closed
+            response.call_on_close(finish)
+        else:
+            finish()
+            response.headers["Server-Timing"] = (
+                f'app;dur={(time.perf_counter() - started) * 1000:.1f}, '
+                f'db;dur={sql.seconds * 1000:.1f};desc="{sql.queries} queries"'
+            )
+        return response
+
+    return metrics
+
+
+def metrics_response(metrics, extra=None):
+    return Response(metrics.render(extra), mimetype="text/plain; version=0.0.4")
@@ -1,7 +1,11 @@
+import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timezone, timedelta
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 IST = timezone(timedelta(hours=5, minutes=30))
 
@@ -23,8 +27,50 @@ def format_ist_time(dt):
         return ist_dt.strftime("%d/%m/%Y %I:%M:%S %p IST")
 
 
+def ensure_columns():
+    # create_all never alters existing tables; add columns introduced since, which
+    # are all nullable so old rows stay valid
+    existing_tables = set(inspect(db.engine).get_table_names())
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable:
+                    logger.warning("Cannot add NOT NULL column %s.%s to an existing table", table.name, column.name)
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def ensure_indexes():
+    # returns the names of unique indexes existing rows violate
+    missing = []
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except IntegrityError:
+                logger.warning("Could not create unique index %s: existing rows violate it", index.name)
+                missing.append(index.name)
+    return missing
+
+
+SKU_FIELDS = ("brand", "model_name", "storage", "color", "condition")
+
+
 class Phone(db.Model):
     __tablename__ = "phones"
+    __table_args__ = (
+        db.Index("uq_phones_sku", *SKU_FIELDS, unique=True),
+        # covers every facet column, so filtered facet counts never touch the table
+        db.Index("ix_phones_facets", "brand", "condition", "storage", "color",
+                 "discontinued", "stock_quantity", "base_price"),
+        db.Index("ix_phones_base_price", "base_price"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     brand = db.Column(db.String(100), nullable=False, index=True)
@@ -40,8 +86,8 @@ class Phone(db.Model):
 
     manual_overrides = db.Column(db.JSON, nullable=True)
 
-    created_at = db.Column(db.DateTime, default=get_ist_now)
-    updated_at = db.Column(db.DateTime, default=get_ist_now, onupdate=get_ist_now)
+    created_at = db.Column(db.DateTime, default=get_ist_now, index=True)
+    updated_at = db.Column(db.DateTime, default=get_ist_now, onupdate=get_ist_now, index=True)
 
     def to_dict(self) -> dict:
         return {
@@ -69,6 +115,10 @@ class Phone(db.Model):
 
 class ListingLog(db.Model):
     __tablename__ = "listing_logs"
+    __table_args__ = (
+        db.Index("ix_listing_logs_phone_created", "phone_id", "created_at"),
+        db.Index("ix_listing_logs_platform_created", "platform", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     phone_id = db.Column(db.Integer, db.ForeignKey("phones.id"), nullable=False)
@@ -78,7 +128,7 @@ class ListingLog(db.Model):
     attempted_price = db.Column(db.Float)
     fee = db.Column(db.Float)
 
-    created_at = db.Column(db.DateTime, default=get_ist_now)
+    created_at = db.Column(db.DateTime, default=get_ist_now, index=True)
 
     phone = db.relationship("Phone", backref=db.backref("listings", lazy=True))
 
@@ -93,3 +143,138 @@ class ListingLog(db.Model):
             "fee": self.fee,
             "created_at": format_ist_time(self.created_at),
         }
+
+
+class PhonePrice(db.Model):
+    __tablename__ = "phone_prices"
+
+    phone_id = db.Column(db.Integer, db.ForeignKey("phones.id", ondelete="CASCADE"), primary_key=True)
+    platform = db.Column(db.String(20), primary_key=True)
+    final_price = db.Column(db.Float, nullable=False)
+    fee = db.Column(db.Float, nullable=False)
+    label = db.Column(db.String(50))
+    is_override = db.Column(db.Boolean, nullable=False, default=False)
+    # platform registry pricing_fingerprint the row was computed with
+    registry_fingerprint = db.Column(db.String(16), index=True)
+
+    updated_at = db.Column(db.DateTime, default=get_ist_now, onupdate=get_ist_now, index=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "phone_id": self.phone_id,
+            "platform": self.platform,
+            "price": self.final_price,
+            "fee": self.fee,
+            "label": self.label,
+            "override": self.is_override,
+            "updated_at": format_ist_time(self.updated_at),
+        }
+
+
+class ListingLogDaily(db.Model):
+    # listing_logs rows older than the retention window, summed per day, phone and platform
+    __tablename__ = "listing_log_daily"
+    __table_args__ = (
+        db.Index("ix_listing_log_daily_phone_day", "phone_id", "day"),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    phone_id = db.Column(db.Integer, primary_key=True)
+    platform = db.Column(db.String(20), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    successes = db.Column(db.Integer, nullable=False, default=0)
+    attempted_price_total = db.Column(db.Float, nullable=False, default=0)
+    listed_price_total = db.Column(db.Float, nullable=False, default=0)
+    fee_total = db.Column(db.Float, nullable=False, default=0)
+
+
+class StockAllocation(db.Model):
+    __tablename__ = "stock_allocations"
+
+    phone_id = db.Column(db.Integer, db.ForeignKey("phones.id", ondelete="CASCADE"), primary_key=True)
+    platform = db.Column(db.String(20), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=get_ist_now, onupdate=get_ist_now)
+
+    def to_dict(self) -> dict:
+        return {
+            "phone_id": self.phone_id,
+            "platform": self.platform,
+            "quantity": self.quantity,
+            "updated_at": format_ist_time(self.updated_at),
+        }
+
+
+class Tag(db.Model):
+    __tablename__ = "tags"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+
+class PhoneTag(db.Model):
+    __tablename__ = "phone_tags"
+    __table_args__ = (
+        db.Index("ix_phone_tags_tag_phone", "tag_id", "phone_id"),
+    )
+
+    phone_id = db.Column(db.Integer, db.ForeignKey("phones.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey("tags.id"), primary_key=True)
+
+
+class PhoneTagQueue(db.Model):
+    # phones whose tag string changed since the last sync, filled by triggers
+    __tablename__ = "phone_tag_queue"
+
+    phone_id = db.Column(db.Integer, primary_key=True)
+
+
+class PhoneChange(db.Model):
+    # one row per phone, rewritten by database triggers on every insert/update/delete
+    __tablename__ = "phone_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = db.Column(db.Integer, primary_key=True)
+    phone_id = db.Column(db.Integer, nullable=False, index=True)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    message = db.Column(db.String(500))
+    # host:pid of the process that runs the job, which keeps heartbeat_at fresh
+    owner = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+
+    created_at = db.Column(db.DateTime, default=get_ist_now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": self.errors or [],
+            "result": self.result,
+            "message": self.message,
+            "owner": self.owner,
+            "heartbeat_at": format_ist_time(self.heartbeat_at),
+            "created_at": format_ist_time(self.created_at),
+            "started_at": format_ist_time(self.started_at),
+            "finished_at": format_ist_time(self.finished_at),
+        }
@@ -1,40 +1,21 @@
-from pricing import calculate_platform_price, map_condition_for_platform
+from pricing import calculate_platform_price
+from platforms import registry
 
 
-def simulate_listing(phone, platform: str):
+def _listing_inputs(phone):
+    if isinstance(phone, dict):
+        return float(phone["base_price"]), phone["condition"], (phone.get("tags", "") or "").lower()
+    return float(phone.base_price), phone.condition, (phone.tags or "").lower()
 
-    base_price = float(phone["base_price"] if isinstance(phone, dict) else phone.base_price)
-    condition = phone["condition"] if isinstance(phone, dict) else phone.condition
-    tags = (phone.get("tags", "") if isinstance(phone, dict) else (phone.tags or "")) or ""
-    tags = tags.lower()
 
+def _evaluate(base_price, condition, tags, platform):
     final_price, fee = calculate_platform_price(base_price, platform)
 
-    label = map_condition_for_platform(condition, platform)
-
-    if platform == "Y" and "usable" in label.lower() and base_price < 20:
-        return (
-            False,
-            "Platform Y rejects very low-priced 'Usable' items",
-            final_price,
-            fee,
-        )
-
-    if final_price < 5.0 and base_price < 50:
-        return (
-            False,
-            f"Fees too high on platform {platform}, margin ${final_price:.2f}",
-            final_price,
-            fee,
-        )
-
-    if "discontinued" in tags:
-        return (
-            False,
-            f"Phone marked discontinued — platform {platform} refused listing",
-            final_price,
-            fee,
-        )
+    label = registry.label(condition, platform)
+
+    rejection = registry.rejection(platform, base_price, final_price, label, tags)
+    if rejection:
+        return (False, rejection, final_price, fee)
 
     return (
         True,
@@ -42,3 +23,13 @@ def simulate_listing(phone, platform: str):
         final_price,
         fee,
     )
+
+
+def simulate_listing(phone, platform: str):
+    base_price, condition, tags = _listing_inputs(phone)
+    return _evaluate(base_price, condition, tags, platform)
+
+
+def simulate_listings(phone, platforms):
+    base_price, condition, tags = _listing_inputs(phone)
+    return {platform: _evaluate(base_price, condition, tags, platform) for platform in platforms}
@@ -0,0 +1,176 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dispatcher import TokenBucket
+from platform_mock import simulate_listing
+from platforms import registry
+
+_PATH_RE = re.compile(r"^/platforms/(?P<platform>[^/]+)/listings$")
+MAX_IDEMPOTENCY_KEYS = 100000
+
+
+def _per_platform(value):
+    # "0.1" applies to every platform, "Y=0.3,Z=1" to the named ones
+    if isinstance(value, dict) or value in (None, ""):
+        return dict(value or {})
+    if "=" not in str(value):
+        return {"*": float(value)}
+    return {name.strip(): float(v) for name, v in (item.split("=", 1) for item in str(value).split(","))}
+
+
+class MockPlatformServer:
+    # a stand-in marketplace API: slow, sometimes failing and throttling, otherwise
+    # answering with the same decisions as platform_mock
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=200, jitter_ms=50, error_rate=0.0,
+                 rate_limit=None, seed=None, stall_rate=0.0, stall_ms=5000):
+        self.latency_ms = _per_platform(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = _per_platform(error_rate)
+        # stalled requests create the listing but answer only after stall_ms, long
+        # enough for the client to time out and retry
+        self.stall_rate = _per_platform(stall_rate)
+        self.stall_ms = float(stall_ms)
+        self.idempotent = OrderedDict()
+        self.buckets = {name: TokenBucket(rps, rps) for name, rps in _per_platform(rate_limit).items()}
+        self.random = random.Random(seed)
+        self.counts = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _setting(self, values, platform, default):
+        return values.get(platform, values.get("*", default))
+
+    def _count(self, platform, status):
+        with self._lock:
+            key = f"{platform}:{status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _process(self, platform, listing):
+        bucket = self.buckets.get(platform) or self.buckets.get("*")
+        if bucket is not None and not bucket.try_acquire():
+            return 429, {"error": "Too many requests"}, False
+        with self._lock:
+            delay = self._setting(self.latency_ms, platform, 0) + self.random.uniform(-1, 1) * self.jitter_ms
+            failed = self.random.random() < self._setting(self.error_rate, platform, 0)
+            stalled = self.random.random() < self._setting(self.stall_rate, platform, 0)
+        time.sleep(max(0.0, delay) / 1000)
+        if failed:
+            return 503, {"error": "Service unavailable"}, False
+        success, message, price, fee = simulate_listing(listing, platform)
+        self._count(platform, "accepted")
+        return 200, {"success": success, "message": message, "price": price, "fee": fee}, stalled
+
+    def _claim_key(self, key):
+        # (entry, True) for the first request with this key, (entry, False) for repeats
+        with self._lock:
+            entry = self.idempotent.get(key)
+            if entry is not None:
+                return entry, False
+            entry = self.idempotent[key] = {"done": threading.Event(), "response": None}
+            while len(self.idempotent) > MAX_IDEMPOTENCY_KEYS:
+                self.idempotent.popitem(last=False)
+            return entry, True
+
+    def respond(self, platform, listing, key=None):
+        if platform not in registry.fees:
+            return 404, {"error": f"Unknown platform: {platform}"}
+        entry = None
+        while key is not None:
+            entry, first = self._claim_key(key)
+            if first:
+                break
+            # wait for the original request, then answer as it did
+            entry["done"].wait()
+            if entry["response"] is not None:
+                self._count(platform, "replayed")
+                return entry["response"]
+            # the original failed without creating anything; this one takes over
+            with self._lock:
+                if self.idempotent.get(key) is entry:
+                    del self.idempotent[key]
+
+        status, payload, stalled = self._process(platform, listing)
+        if entry is not None:
+            if status == 200:
+                entry["response"] = (status, payload)
+            else:
+                with self._lock:
+                    if self.idempotent.get(key) is entry:
+                        del self.idempotent[key]
+            entry["done"].set()
+        if stalled:
+            time.sleep(self.stall_ms / 1000)
+        return status, payload
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                match = _PATH_RE.match(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if match is None:
+                    status, payload = 404, {"error": "Not found"}
+                else:
+                    try:
+                        status, payload = server.respond(match["platform"], json.loads(body),
+                                                         self.headers.get("Idempotency-Key"))
+                    except (ValueError, KeyError, TypeError) as e:
+                        status, payload = 400, {"error": str(e)}
+                    server._count(match["platform"], status)
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # a stalled answer to a client that already timed out
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock marketplace API for PLATFORM_API_URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", default="200", help="e.g. 200 or X=100,Y=400,Z=200")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", default="0", help="share of requests answered 503, e.g. 0.05 or Z=1")
+    parser.add_argument("--rate-limit", default="", help="requests per second before 429s, e.g. 20 or Y=10")
+    parser.add_argument("--stall-rate", default="0", help="share of accepted requests answered late, e.g. 0.05")
+    parser.add_argument("--stall-ms", type=float, default=5000)
+    args = parser.parse_args()
+    server = MockPlatformServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                                args.rate_limit or None, stall_rate=args.stall_rate, stall_ms=args.stall_ms)
+    print(f"Mock platforms listening on {server.url}")
+    server.httpd.serve_forever()
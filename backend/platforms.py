@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+
+DEFAULT_PLATFORMS_FILE = os.path.join(os.path.abspath(os.path.dirname(__file__)), "platforms.json")
+
+# how listings are sent to a remote platform API; "dispatch" at the top level of the
+# file overrides these for every platform, a platform's own "dispatch" for that one
+DEFAULT_DISPATCH = {
+    "concurrency": 8,        # calls in flight per platform
+    "rate": 20.0,            # calls per second (token bucket refill)
+    "burst": 10,             # token bucket size
+    "timeout": 2.0,          # seconds per attempt
+    "retries": 2,            # extra attempts after timeouts, throttling and 5xx
+    "backoff": 0.1,          # first retry delay in seconds, doubled per attempt
+    "backoff_max": 2.0,
+    "deadline": 10.0,        # seconds per listing including retries and rate-limit waits
+    "failure_threshold": 5,  # consecutive failures that open the circuit
+    "reset_timeout": 30.0,   # seconds before an open circuit lets a probe through
+}
+
+
+def _reject_label_below_price(spec, platform, labels):
+    needle = spec["label_contains"].lower()
+    limit = float(spec["below_base_price"])
+    message = spec["message"]
+    matching = {label: needle in label.lower() for label in set(labels.values())}
+
+    def rule(base_price, final_price, label, tags):
+        hit = matching.get(label)
+        if hit is None:
+            hit = needle in label.lower()
+        if hit and base_price < limit:
+            return message.format(platform=platform, base_price=base_price, final_price=final_price)
+        return None
+    return rule
+
+
+def _reject_low_margin(spec, platform, labels):
+    min_final = float(spec["below_final_price"])
+    max_base = float(spec["below_base_price"])
+    message = spec["message"]
+
+    def rule(base_price, final_price, label, tags):
+        if final_price < min_final and base_price < max_base:
+            return message.format(platform=platform, base_price=base_price, final_price=final_price)
+        return None
+    return rule
+
+
+def _reject_tag(spec, platform, labels):
+    tag = spec["tag"].lower()
+    message = spec["message"]
+
+    def rule(base_price, final_price, label, tags):
+        if tag in tags:
+            return message.format(platform=platform, base_price=base_price, final_price=final_price)
+        return None
+    return rule
+
+
+RULE_TYPES = {
+    "reject_label_below_price": _reject_label_below_price,
+    "reject_low_margin": _reject_low_margin,
+    "reject_tag": _reject_tag,
+}
+
+
+class PlatformRegistry:
+
+    def __init__(self):
+        self.fees = {}
+        self.condition_maps = {}
+        self.default_labels = {}
+        self.rules = {}
+        self.dispatch = {}
+        self.pricing_fingerprint = None
+
+    def load(self, spec):
+        fees, condition_maps, default_labels, rules, dispatch = {}, {}, {}, {}, {}
+        shared = spec.get("rules", [])
+        shared_dispatch = spec.get("dispatch", {})
+        for name, platform in spec["platforms"].items():
+            fees[name] = (float(platform["fee_rate"]), float(platform.get("fixed_fee", 0.0)))
+            labels = dict(platform.get("conditions", {}))
+            condition_maps[name] = labels
+            default_labels[name] = labels.get(platform.get("default_condition", "Good"))
+            compiled = []
+            for rule in platform.get("rules", []) + shared:
+                if rule["type"] not in RULE_TYPES:
+                    raise ValueError(f"Unknown rule type for platform {name}: {rule['type']}")
+                compiled.append(RULE_TYPES[rule["type"]](rule, name, labels))
+            rules[name] = compiled
+            settings = {**shared_dispatch, **platform.get("dispatch", {})}
+            unknown = set(settings) - set(DEFAULT_DISPATCH)
+            if unknown:
+                raise ValueError(f"Unknown dispatch settings for platform {name}: {', '.join(sorted(unknown))}")
+            dispatch[name] = {key: type(default)(settings.get(key, default))
+                              for key, default in DEFAULT_DISPATCH.items()}
+
+        # update in place so modules holding references see the new tables
+        for current, new in ((self.fees, fees), (self.condition_maps, condition_maps),
+                             (self.default_labels, default_labels), (self.rules, rules),
+                             (self.dispatch, dispatch)):
+            current.clear()
+            current.update(new)
+        # identifies the fees and labels stored prices were computed with
+        pricing = json.dumps([fees, condition_maps, default_labels], sort_keys=True)
+        self.pricing_fingerprint = hashlib.sha1(pricing.encode("utf-8")).hexdigest()[:16]
+        return self
+
+    def load_file(self, path=None):
+        with open(path or DEFAULT_PLATFORMS_FILE, encoding="utf-8") as f:
+            return self.load(json.load(f))
+
+    def label(self, condition, platform):
+        labels = self.condition_maps.get(platform)
+        if labels is None:
+            return condition
+        label = labels.get(condition)
+        if label is None:
+            label = self.default_labels[platform] or condition
+        return label
+
+    def rejection(self, platform, base_price, final_price, label, tags):
+        for rule in self.rules[platform]:
+            message = rule(base_price, final_price, label, tags)
+            if message:
+                return message
+        return None
+
+
+registry = PlatformRegistry().load_file()
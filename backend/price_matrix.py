@@ -0,0 +1,201 @@
+import numpy as np
+from sqlalchemy import func, or_
+from models import db, Phone, PhonePrice, get_ist_now
+from pricing import PLATFORM_FEES, round_money, map_condition_for_platform
+from platforms import registry
+
+# distance from a .5 cent tie below which float error could flip the rounding
+TIE_TOLERANCE = 1e-6
+
+
+def round_money_array(values):
+    scaled = values * 100.0
+    floor = np.floor(scaled)
+    rounded = np.floor(scaled + 0.5) / 100.0
+    near_tie = np.abs(scaled - floor - 0.5) < TIE_TOLERANCE
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round_money(float(values[i]))
+    return rounded
+
+
+def compute_price_matrix(base_prices, platforms):
+    base = np.asarray(base_prices, dtype=np.float64)
+    valid = base > 0
+    finals = {}
+    fees = {}
+    for platform in platforms:
+        if platform not in PLATFORM_FEES:
+            raise ValueError(f"Unknown platform: {platform}")
+        rate, fixed = PLATFORM_FEES[platform]
+        fee = rate * base + fixed
+        final = np.maximum(0.0, base - fee)
+        finals[platform] = round_money_array(final)
+        fees[platform] = round_money_array(fee)
+    return valid, finals, fees
+
+
+def load_pricing_rows(query=None):
+    query = query if query is not None else Phone.query
+    return query.with_entities(Phone.id, Phone.base_price, Phone.condition,
+                               Phone.manual_overrides).order_by(Phone.id).all()
+
+
+def build_price_matrix(rows, platforms):
+    valid, finals, fees = compute_price_matrix([r.base_price for r in rows], platforms)
+    labels = {}
+    matrix = []
+    for i, row in enumerate(rows):
+        overrides = row.manual_overrides or {}
+        prices = {}
+        for platform in platforms:
+            label_key = (row.condition, platform)
+            if label_key not in labels:
+                labels[label_key] = map_condition_for_platform(row.condition, platform)
+            override = overrides.get(platform)
+            if override:
+                prices[platform] = {"price": override, "fee": 0, "override": True,
+                                    "label": labels[label_key]}
+            elif valid[i]:
+                prices[platform] = {"price": float(finals[platform][i]), "fee": float(fees[platform][i]),
+                                    "override": False, "label": labels[label_key]}
+            else:
+                prices[platform] = None
+        matrix.append({"id": row.id, "base_price": row.base_price, "prices": prices})
+    return matrix
+
+
+def persist_price_matrix(matrix, phone_ids=None):
+    now = get_ist_now()
+    records = []
+    for entry in matrix:
+        for platform, price in entry["prices"].items():
+            if price is None:
+                continue
+            records.append({
+                "phone_id": entry["id"],
+                "platform": platform,
+                "final_price": price["price"],
+                "fee": price["fee"],
+                "label": price["label"],
+                "is_override": price["override"],
+                "registry_fingerprint": registry.pricing_fingerprint,
+                "updated_at": now,
+            })
+    table = PhonePrice.__table__
+    if phone_ids is None:
+        db.session.execute(table.delete())
+    else:
+        db.session.execute(table.delete().where(table.c.phone_id.in_(phone_ids)))
+    if records:
+        db.session.execute(PhonePrice.__table__.insert(), records)
+    return len(records)
+
+
+def refresh_phone_prices(phone_ids):
+    phone_ids = list(phone_ids)
+    if not phone_ids:
+        return 0
+    rows = load_pricing_rows(Phone.query.filter(Phone.id.in_(phone_ids)))
+    return persist_price_matrix(build_price_matrix(rows, list(PLATFORM_FEES)), phone_ids)
+
+
+def delete_phone_prices(phone_ids):
+    table = PhonePrice.__table__
+    db.session.execute(table.delete().where(table.c.phone_id.in_(list(phone_ids))))
+
+
+def refresh_stale_prices(batch_size=5000, since=None):
+    # since limits the check to phones written from then on, e.g. by an import
+    stale = db.session.query(Phone.id) \
+        .outerjoin(PhonePrice, PhonePrice.phone_id == Phone.id) \
+        .filter(Phone.base_price > 0)
+    if since is not None:
+        stale = stale.filter(Phone.updated_at >= since)
+    stale = stale.group_by(Phone.id, Phone.updated_at) \
+        .having(or_(func.count(PhonePrice.platform) < len(PLATFORM_FEES),
+                    func.min(PhonePrice.updated_at) < Phone.updated_at))
+    stale_ids = [row[0] for row in stale]
+    for start in range(0, len(stale_ids), batch_size):
+        refresh_phone_prices(stale_ids[start:start + batch_size])
+
+    if since is None:
+        table = PhonePrice.__table__
+        db.session.execute(table.delete().where(~table.c.phone_id.in_(db.select(Phone.id))))
+    return len(stale_ids)
+
+
+def refresh_outdated_prices(batch_size=5000):
+    # prices computed before the platform registry's fees or labels last changed
+    fingerprint = PhonePrice.registry_fingerprint
+    current = registry.pricing_fingerprint
+    # ranges either side of the current fingerprint, so an up to date table costs index seeks
+    outdated = or_(fingerprint.is_(None), fingerprint < current, fingerprint > current)
+    if db.session.query(PhonePrice.phone_id).filter(outdated).first() is None:
+        return 0
+    outdated_ids = [row[0] for row in db.session.query(PhonePrice.phone_id).distinct().filter(outdated)]
+    for start in range(0, len(outdated_ids), batch_size):
+        refresh_phone_prices(outdated_ids[start:start + batch_size])
+    return len(outdated_ids)
+
+
+def refresh_missing_prices():
+    # phones that predate phone_prices have no rows at all until something rewrites them
+    if db.session.query(PhonePrice.phone_id).first() is not None:
+        return 0
+    if db.session.query(Phone.id).first() is None:
+        return 0
+    return refresh_stale_prices()
+
+
+def attach_prices(items, batch_size=5000):
+    ids = [item["id"] for item in items]
+    prices = {}
+    for start in range(0, len(ids), batch_size):
+        for price in PhonePrice.query.filter(PhonePrice.phone_id.in_(ids[start:start + batch_size])):
+            prices.setdefault(price.phone_id, {})[price.platform] = {
+                "price": price.final_price,
+                "fee": price.fee,
+                "label": price.label,
+                "override": price.is_override,
+            }
+    # rows not stored yet are computed, as lookup_prices does
+    incomplete = [i for i in ids if len(prices.get(i, ())) < len(PLATFORM_FEES)]
+    for start in range(0, len(incomplete), batch_size):
+        rows = load_pricing_rows(Phone.query.filter(Phone.id.in_(incomplete[start:start + batch_size])))
+        for entry in build_price_matrix(rows, list(PLATFORM_FEES)):
+            stored = prices.setdefault(entry["id"], {})
+            for platform, price in entry["prices"].items():
+                if platform not in stored and price is not None:
+                    stored[platform] = price
+    for item in items:
+        item["prices"] = prices.get(item["id"], {})
+    return items
+
+
+def lookup_prices(phone_ids, platforms):
+    phone_ids = list(dict.fromkeys(phone_ids))
+    prices = {}
+    stored = PhonePrice.query.with_entities(
+        PhonePrice.phone_id, PhonePrice.platform, PhonePrice.final_price,
+        PhonePrice.fee, PhonePrice.is_override,
+    ).filter(PhonePrice.phone_id.in_(phone_ids), PhonePrice.platform.in_(platforms))
+    for phone_id, platform, price, fee, is_override in stored:
+        prices.setdefault(phone_id, {})[platform] = {"price": price, "fee": fee, "override": is_override}
+
+    incomplete = [i for i in phone_ids if len(prices.get(i, ())) < len(platforms)]
+    not_found = []
+    if incomplete:
+        rows = load_pricing_rows(Phone.query.filter(Phone.id.in_(incomplete)))
+        found = {row.id for row in rows}
+        not_found = [i for i in incomplete if i not in found]
+        for entry in build_price_matrix(rows, platforms):
+            computed = prices.setdefault(entry["id"], {})
+            for platform, price in entry["prices"].items():
+                if platform in computed:
+                    continue
+                if price is None:
+                    computed[platform] = {"error": "Base price must be greater than 0"}
+                else:
+                    computed[platform] = {"price": price["price"], "fee": price["fee"],
+                                          "override": price["override"]}
+    return prices, not_found
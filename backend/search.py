@@ -0,0 +1,102 @@
+import logging
+import re
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, Phone
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "phones_fts"
+FTS_COLUMNS = ["brand", "model_name", "storage", "color", "tags"]
+# bm25 weights, same order as FTS_COLUMNS
+FTS_WEIGHTS = [5.0, 10.0, 1.0, 1.0, 2.0]
+
+_columns = ", ".join(FTS_COLUMNS)
+_new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='phones', content_rowid='id', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON phones BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON phones BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON phones BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def init_search_index():
+    if db.engine.dialect.name != "sqlite":
+        return False
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            for statement in FTS_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError as e:
+        # SQLite built without FTS5
+        logger.warning("Full-text search disabled, could not create %s: %s", FTS_TABLE, e.orig)
+        return False
+    return True
+
+
+def rebuild_search_index():
+    with db.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def search_enabled():
+    return bool(current_app.config.get("SEARCH_FTS"))
+
+
+def build_match_query(q):
+    tokens = _TOKEN_RE.findall(q.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def match_ids_subquery(match):
+    return text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match").bindparams(match=match)
+
+
+def search_phones(q, condition="", limit=20, offset=0):
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    sql = (
+        f"SELECT phones.id, bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} JOIN phones ON phones.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match"
+    )
+    params = {"match": match, "limit": limit, "offset": offset}
+    if condition:
+        sql += " AND phones.condition = :condition"
+        params["condition"] = condition
+    sql += " ORDER BY score LIMIT :limit OFFSET :offset"
+
+    ranked = db.session.execute(text(sql), params).all()
+    if not ranked:
+        return []
+
+    phones = {p.id: p for p in Phone.query.filter(Phone.id.in_([r.id for r in ranked]))}
+    results = []
+    for row in ranked:
+        phone = phones.get(row.id)
+        if phone is None:
+            continue
+        item = phone.to_dict()
+        item["score"] = round(-row.score, 4)
+        results.append(item)
+    return results
@@ -0,0 +1,142 @@
+import json
+from flask import Response, request, stream_with_context
+from models import Phone, ListingLog, IST
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PHONE_COLUMNS = [
+    "id", "brand", "model_name", "condition", "storage", "color", "base_price",
+    "stock_quantity", "discontinued", "tags", "manual_overrides", "created_at", "updated_at",
+]
+LOG_COLUMNS = ["id", "phone_id", "platform", "success", "message", "attempted_price", "fee", "created_at"]
+
+STREAM_CHUNK_ROWS = 500
+
+
+def _format_time(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(IST)
+    hour = dt.hour % 12 or 12
+    meridiem = "AM" if dt.hour < 12 else "PM"
+    return (f"{dt.day:02d}/{dt.month:02d}/{dt.year:04d} "
+            f"{hour:02d}:{dt.minute:02d}:{dt.second:02d} {meridiem} IST")
+
+
+class BatchFormatter:
+    # bulk imports share timestamps and tag strings, so memoize per response
+
+    def __init__(self):
+        self._times = {}
+        self._tags = {}
+
+    def time(self, dt):
+        if dt is None:
+            return None
+        formatted = self._times.get(dt)
+        if formatted is None:
+            formatted = self._times[dt] = _format_time(dt)
+        return formatted
+
+    def tags(self, raw):
+        if not raw:
+            return []
+        tags = self._tags.get(raw)
+        if tags is None:
+            tags = self._tags[raw] = [t.strip() for t in raw.split(",") if t.strip()]
+        return list(tags)
+
+
+def iter_phone_dicts(query, batch_size=1000):
+    fmt = BatchFormatter()
+    rows = query.with_entities(*[getattr(Phone, c) for c in PHONE_COLUMNS]).yield_per(batch_size)
+    for (id_, brand, model_name, condition, storage, color, base_price,
+         stock_quantity, discontinued, tags, overrides, created_at, updated_at) in rows:
+        yield {
+            "id": id_,
+            "brand": brand,
+            "model_name": model_name,
+            "condition": condition,
+            "storage": storage,
+            "color": color,
+            "base_price": base_price,
+            "stock_quantity": stock_quantity,
+            "discontinued": discontinued,
+            "tags": fmt.tags(tags),
+            "manual_overrides": overrides or {},
+            "created_at": fmt.time(created_at),
+            "updated_at": fmt.time(updated_at),
+        }
+
+
+def iter_log_dicts(query, batch_size=1000):
+    fmt = BatchFormatter()
+    rows = query.with_entities(*[getattr(ListingLog, c) for c in LOG_COLUMNS]).yield_per(batch_size)
+    for id_, phone_id, platform, success, message, attempted_price, fee, created_at in rows:
+        yield {
+            "id": id_,
+            "phone_id": phone_id,
+            "platform": platform,
+            "success": success,
+            "message": message,
+            "attempted_price": attempted_price,
+            "fee": fee,
+            "created_at": fmt.time(created_at),
+        }
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    dumps = _encoder.encode
+
+
+def _json_array_chunks(items):
+    yield "["
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield ("" if first else ",") + ",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ("" if first else ",") + ",".join(chunk)
+    yield "]"
+
+
+def ndjson_chunks(items):
+    chunk = []
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def negotiated_mimetype():
+    offered = ["application/json", "application/x-ndjson"]
+    if msgpack is not None:
+        offered.append("application/msgpack")
+    return request.accept_mimetypes.best_match(offered, default="application/json")
+
+
+def serialize_rows(items, mimetype=None):
+    mimetype = mimetype or negotiated_mimetype()
+    if mimetype == "application/msgpack":
+        return Response(msgpack.packb(list(items)), mimetype=mimetype)
+    if mimetype == "application/x-ndjson":
+        return Response(stream_with_context(ndjson_chunks(items)), mimetype=mimetype)
+    return Response(stream_with_context(_json_array_chunks(items)), mimetype="application/json")
@@ -0,0 +1,86 @@
+from sqlalchemy import func, case
+from models import db, Phone, ListingLog
+from cache import MemoryCache
+from db_events import on_tables_written
+from log_retention import platform_rollup_totals
+
+DEFAULT_LOW_STOCK_THRESHOLD = 5
+MAX_LOW_STOCK_THRESHOLD = 1000
+LOW_STOCK_LIMIT = 50
+STATS_TABLES = {"phones", "listing_logs", "listing_log_daily"}
+MAX_CACHED_THRESHOLDS = 16
+
+# one entry per low_stock threshold; like the read cache, a write that commits while
+# the stats are computed keeps them from being stored
+_cache = MemoryCache(max_entries=MAX_CACHED_THRESHOLDS)
+
+
+@on_tables_written
+def _invalidate(tables):
+    if tables & STATS_TABLES:
+        _cache.invalidate()
+
+
+def _money(value):
+    return round(float(value or 0), 2)
+
+
+def _inventory_groups(column):
+    rows = db.session.query(
+        column,
+        func.count(Phone.id),
+        func.coalesce(func.sum(Phone.stock_quantity), 0),
+        func.coalesce(func.sum(Phone.base_price * Phone.stock_quantity), 0),
+    ).group_by(column).order_by(column).all()
+    return [{"key": key, "phones": phones, "units": int(units), "value": _money(value)}
+            for key, phones, units, value in rows]
+
+
+def _platform_stats():
+    rows = db.session.query(
+        ListingLog.platform,
+        func.count(ListingLog.id),
+        func.sum(case((ListingLog.success.is_(True), 1), else_=0)),
+        func.sum(case((ListingLog.success.is_(True), ListingLog.fee), else_=0)),
+        func.sum(case((ListingLog.success.is_(True), ListingLog.attempted_price), else_=0)),
+    ).group_by(ListingLog.platform).all()
+    # archived attempts only survive in the daily rollups
+    totals = platform_rollup_totals()
+    for platform, attempts, successes, fees, prices in rows:
+        old = totals.get(platform, (0, 0, 0, 0))
+        totals[platform] = (old[0] + attempts, old[1] + (successes or 0), old[2] + (fees or 0), old[3] + (prices or 0))
+    return [{
+        "platform": platform,
+        "attempts": attempts,
+        "successes": int(successes),
+        "success_rate": round(successes / attempts, 4) if attempts else 0,
+        "total_fees": _money(fees),
+        "avg_listed_price": _money(prices / successes if successes else 0),
+    } for platform, (attempts, successes, fees, prices) in sorted(totals.items())]
+
+
+def compute_stats(low_stock_threshold=DEFAULT_LOW_STOCK_THRESHOLD):
+    phones, units, value = db.session.query(
+        func.count(Phone.id),
+        func.coalesce(func.sum(Phone.stock_quantity), 0),
+        func.coalesce(func.sum(Phone.base_price * Phone.stock_quantity), 0),
+    ).one()
+
+    low_stock = db.session.query(Phone.id, Phone.brand, Phone.model_name, Phone.stock_quantity) \
+        .filter(Phone.stock_quantity <= low_stock_threshold, Phone.discontinued.isnot(True)) \
+        .order_by(Phone.stock_quantity, Phone.id).limit(LOW_STOCK_LIMIT).all()
+
+    return {
+        "totals": {"phones": phones, "units": int(units), "value": _money(value)},
+        "by_brand": _inventory_groups(Phone.brand),
+        "by_condition": _inventory_groups(Phone.condition),
+        "by_discontinued": _inventory_groups(Phone.discontinued),
+        "low_stock_threshold": low_stock_threshold,
+        "low_stock": [{"id": i, "brand": b, "model_name": m, "stock_quantity": s} for i, b, m, s in low_stock],
+        "platforms": _platform_stats(),
+    }
+
+
+def get_stats(low_stock_threshold=DEFAULT_LOW_STOCK_THRESHOLD, ttl=30):
+    _cache.ttl = ttl
+    return _cache.get_or_load(low_stock_threshold, lambda: compute_stats(low_stock_threshold))
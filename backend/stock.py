@@ -0,0 +1,96 @@
+from collections import Counter
+from sqlalchemy import bindparam, select, update
+from models import db, Phone, StockAllocation, get_ist_now
+
+phones = Phone.__table__
+allocations = StockAllocation.__table__
+
+# a single conditional statement: the row lock (or SQLite's write lock) it takes is
+# the only serialization, so listings of different phones never wait on each other
+_reserve = update(phones) \
+    .where(phones.c.id == bindparam("key_id"), phones.c.stock_quantity >= bindparam("units")) \
+    .values(stock_quantity=phones.c.stock_quantity - bindparam("units"))
+
+_restock = update(phones) \
+    .where(phones.c.id == bindparam("key_id")) \
+    .values(stock_quantity=phones.c.stock_quantity + bindparam("units"))
+
+_allocate = update(allocations) \
+    .where(allocations.c.phone_id == bindparam("key_phone"), allocations.c.platform == bindparam("key_platform")) \
+    .values(quantity=allocations.c.quantity + bindparam("units"), updated_at=bindparam("now"))
+
+_deallocate = update(allocations) \
+    .where(allocations.c.phone_id == bindparam("key_phone"), allocations.c.platform == bindparam("key_platform"),
+           allocations.c.quantity >= bindparam("units")) \
+    .values(quantity=allocations.c.quantity - bindparam("units"), updated_at=bindparam("now"))
+
+
+def _take(phone_id, units):
+    return db.session.execute(_reserve, {"key_id": phone_id, "units": units}).rowcount == 1
+
+
+def _add_allocations(counts):
+    if not counts:
+        return
+    # callers hold the phone rows through _take, so nobody else can insert these keys
+    existing = {tuple(row) for row in db.session.execute(
+        select(allocations.c.phone_id, allocations.c.platform)
+        .where(allocations.c.phone_id.in_({phone_id for phone_id, _ in counts}))
+    )}
+    now = get_ist_now()
+    updates = [{"key_phone": phone_id, "key_platform": platform, "units": units, "now": now}
+               for (phone_id, platform), units in counts.items() if (phone_id, platform) in existing]
+    inserts = [{"phone_id": phone_id, "platform": platform, "quantity": units, "updated_at": now}
+               for (phone_id, platform), units in counts.items() if (phone_id, platform) not in existing]
+    if updates:
+        db.session.execute(_allocate, updates)
+    if inserts:
+        db.session.execute(allocations.insert(), inserts)
+
+
+def reserve_stock(phone_id, platform, quantity=1):
+    if not _take(phone_id, quantity):
+        return False
+    _add_allocations({(phone_id, platform): quantity})
+    return True
+
+
+def reserve_stock_batch(requests):
+    # requests maps phone_id -> platforms in priority order; returns the granted pairs
+    granted = []
+    for phone_id in sorted(requests):
+        platforms = requests[phone_id]
+        if _take(phone_id, len(platforms)):
+            granted.extend((phone_id, platform) for platform in platforms)
+            continue
+        for platform in platforms:
+            if not _take(phone_id, 1):
+                break
+            granted.append((phone_id, platform))
+    _add_allocations(Counter(granted))
+    return set(granted)
+
+
+def release_stock(phone_id, platform, quantity=None):
+    if quantity is None:
+        quantity = db.session.execute(
+            select(allocations.c.quantity)
+            .where(allocations.c.phone_id == phone_id, allocations.c.platform == platform)
+        ).scalar() or 0
+    if quantity <= 0:
+        return 0
+    released = db.session.execute(_deallocate, {"key_phone": phone_id, "key_platform": platform,
+                                                "units": quantity, "now": get_ist_now()}).rowcount
+    if released != 1:
+        return 0
+    db.session.execute(_restock, {"key_id": phone_id, "units": quantity})
+    return quantity
+
+
+def phone_allocations(phone_id):
+    return [a.to_dict() for a in StockAllocation.query.filter_by(phone_id=phone_id)
+            .order_by(StockAllocation.platform)]
+
+
+def delete_allocations(phone_ids):
+    db.session.execute(allocations.delete().where(allocations.c.phone_id.in_(list(phone_ids))))
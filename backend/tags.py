@@ -0,0 +1,166 @@
+import re
+from flask import current_app, has_app_context
+from sqlalchemy import text, select, func, and_, or_
+from models import db, Phone, Tag, PhoneTag, PhoneTagQueue
+from database import dialect_insert
+from db_events import before_commit_writes
+
+TAG_QUEUE_TABLE = "phone_tag_queue"
+TAG_SYNC_BATCH = 1000
+MAX_TAG_LENGTH = 100
+
+phones = Phone.__table__
+tags = Tag.__table__
+phone_tags = PhoneTag.__table__
+tag_queue = PhoneTagQueue.__table__
+
+# Phone.tags stays the source of truth; the triggers only queue the phones whose tag
+# string changed (whatever wrote it: ORM, bulk import, upsert) and the queue is drained
+# into phone_tags in the same transaction, right before it commits
+SQLITE_TAG_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS {TAG_QUEUE_TABLE}_ai AFTER INSERT ON phones BEGIN "
+    f"INSERT OR IGNORE INTO {TAG_QUEUE_TABLE}(phone_id) VALUES (new.id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TAG_QUEUE_TABLE}_au AFTER UPDATE OF tags ON phones BEGIN "
+    f"INSERT OR IGNORE INTO {TAG_QUEUE_TABLE}(phone_id) VALUES (new.id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TAG_QUEUE_TABLE}_ad AFTER DELETE ON phones BEGIN "
+    f"DELETE FROM phone_tags WHERE phone_id = old.id; "
+    f"DELETE FROM {TAG_QUEUE_TABLE} WHERE phone_id = old.id; END",
+]
+
+POSTGRES_TAG_DDL = [
+    f"CREATE OR REPLACE FUNCTION queue_phone_tags() RETURNS trigger AS $$ BEGIN "
+    f"IF TG_OP = 'DELETE' THEN "
+    f"DELETE FROM phone_tags WHERE phone_id = OLD.id; "
+    f"DELETE FROM {TAG_QUEUE_TABLE} WHERE phone_id = OLD.id; "
+    f"ELSE INSERT INTO {TAG_QUEUE_TABLE}(phone_id) VALUES (NEW.id) ON CONFLICT DO NOTHING; "
+    f"END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+    f"DROP TRIGGER IF EXISTS {TAG_QUEUE_TABLE}_trigger ON phones",
+    f"CREATE TRIGGER {TAG_QUEUE_TABLE}_trigger AFTER INSERT OR UPDATE OF tags OR DELETE ON phones "
+    f"FOR EACH ROW EXECUTE FUNCTION queue_phone_tags()",
+]
+
+_EXISTS_SQL = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name",
+    "postgresql": "SELECT 1 FROM pg_trigger WHERE tgname = :name",
+}
+_TRIGGER_NAMES = {"sqlite": f"{TAG_QUEUE_TABLE}_ai", "postgresql": f"{TAG_QUEUE_TABLE}_trigger"}
+_DDL = {"sqlite": SQLITE_TAG_DDL, "postgresql": POSTGRES_TAG_DDL}
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_tag(tag):
+    return _SPACES_RE.sub(" ", tag).strip().lower()[:MAX_TAG_LENGTH]
+
+
+def parse_tags(value):
+    names = []
+    for tag in (value or "").split(","):
+        name = normalize_tag(tag)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def init_tag_index():
+    dialect = db.engine.dialect.name
+    if dialect not in _DDL:
+        return False
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(_EXISTS_SQL[dialect]), {"name": _TRIGGER_NAMES[dialect]}).first()
+            for statement in _DDL[dialect]:
+                conn.execute(text(statement))
+            if not exists:
+                # phones that predate the index are migrated through the queue
+                conn.execute(text(f"INSERT INTO {TAG_QUEUE_TABLE}(phone_id) SELECT id FROM phones"))
+        drain_tag_queue(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return False
+    return True
+
+
+def tag_index_enabled():
+    return has_app_context() and bool(current_app.config.get("TAG_INDEX"))
+
+
+def _tag_ids(session, names):
+    if not names:
+        return {}
+    ids = dict(session.execute(select(tags.c.name, tags.c.id).where(tags.c.name.in_(names))).all())
+    missing = [{"name": name} for name in names if name not in ids]
+    if missing:
+        # another worker may be adding the same tag
+        insert = dialect_insert(session.get_bind(), tags).on_conflict_do_nothing(index_elements=["name"])
+        session.execute(insert, missing)
+        ids.update(session.execute(
+            select(tags.c.name, tags.c.id).where(tags.c.name.in_([row["name"] for row in missing]))
+        ).all())
+    return ids
+
+
+def sync_phone_tags(session, phone_ids):
+    phone_ids = list(phone_ids)
+    if not phone_ids:
+        return
+    rows = session.execute(select(phones.c.id, phones.c.tags).where(phones.c.id.in_(phone_ids))).all()
+    parsed = {phone_id: parse_tags(value) for phone_id, value in rows}
+    ids = _tag_ids(session, sorted({name for names in parsed.values() for name in names}))
+    session.execute(phone_tags.delete().where(phone_tags.c.phone_id.in_(phone_ids)))
+    links = [{"phone_id": phone_id, "tag_id": ids[name]}
+             for phone_id, names in parsed.items() for name in names]
+    if links:
+        session.execute(phone_tags.insert(), links)
+
+
+def drain_tag_queue(session, batch=TAG_SYNC_BATCH):
+    while True:
+        phone_ids = session.execute(
+            select(tag_queue.c.phone_id).order_by(tag_queue.c.phone_id).limit(batch)
+        ).scalars().all()
+        if not phone_ids:
+            return
+        sync_phone_tags(session, phone_ids)
+        session.execute(tag_queue.delete().where(tag_queue.c.phone_id.in_(phone_ids)))
+
+
+@before_commit_writes
+def _sync_queued_tags(session, tables):
+    if "phones" in tables and tag_index_enabled():
+        drain_tag_queue(session)
+
+
+def _tag_pattern_filter(names, match_any):
+    # fallback without the index: compare whole comma-separated entries, not substrings
+    padded = "," + func.lower(func.replace(func.replace(Phone.tags, ", ", ","), " ,", ",")) + ","
+    clauses = [padded.like(f"%,{name},%") for name in names]
+    return or_(*clauses) if match_any else and_(*clauses)
+
+
+def tag_filter(names, match_any=False):
+    if not tag_index_enabled():
+        return _tag_pattern_filter(names, match_any)
+    matching = select(phone_tags.c.phone_id) \
+        .join(tags, tags.c.id == phone_tags.c.tag_id) \
+        .where(tags.c.name.in_(names))
+    if not match_any and len(names) > 1:
+        matching = matching.group_by(phone_tags.c.phone_id) \
+            .having(func.count(phone_tags.c.tag_id) == len(names))
+    return Phone.id.in_(matching)
+
+
+def tag_counts(prefix="", limit=None):
+    # every row comes out of the (tag_id, phone_id) index
+    count = func.count(phone_tags.c.phone_id)
+    query = select(tags.c.name, count.label("count")) \
+        .join(phone_tags, phone_tags.c.tag_id == tags.c.id) \
+        .group_by(tags.c.id, tags.c.name) \
+        .order_by(count.desc(), tags.c.name)
+    prefix = normalize_tag(prefix)
+    if prefix:
+        query = query.where(tags.c.name.startswith(prefix, autoescape=True))
+    if limit:
+        query = query.limit(limit)
+    return [{"name": name, "count": n} for name, n in db.session.execute(query)]
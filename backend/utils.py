@@ -1,7 +1,15 @@
+import codecs
 import csv
+import itertools
+import os
 import re
+from datetime import datetime
 from io import StringIO
-from models import db, Phone
+from sqlalchemy import tuple_, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from models import db, Phone, SKU_FIELDS, get_ist_now
+from database import DIALECT_INSERTS, dialect_insert
+from price_matrix import refresh_stale_prices
 
 
 def sanitize_string(value):
@@ -11,6 +19,46 @@ def sanitize_string(value):
     return sanitized[:100]
 
 
+def parse_datetime(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+
+
+REQUIRED_CSV_FIELDS = ['brand', 'model_name', 'condition', 'base_price']
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+UPSERT_FIELDS = ['base_price', 'stock_quantity']
+DUPLICATE_SKU_ERROR = "A phone with the same brand, model, storage, color and condition already exists"
+
+
+def parse_phone_row(row):
+    for field in REQUIRED_CSV_FIELDS:
+        if not (row.get(field) or '').strip():
+            raise ValueError(f"Missing required field: {field}")
+
+    values = {
+        'brand': sanitize_string(row['brand'].strip()),
+        'model_name': sanitize_string(row['model_name'].strip()),
+        'condition': sanitize_string(row['condition'].strip()),
+        'storage': sanitize_string((row.get('storage') or '').strip()),
+        'color': sanitize_string((row.get('color') or '').strip()),
+        'base_price': float(row['base_price']),
+        'stock_quantity': int(row.get('stock_quantity', 0)),
+        'discontinued': str(row.get('discontinued', 'false')).lower() in ['true', '1', 'yes'],
+        'tags': sanitize_string((row.get('tags') or '').strip()),
+    }
+
+    if values['base_price'] <= 0:
+        raise ValueError("Base price must be greater than 0")
+    if values['stock_quantity'] < 0:
+        raise ValueError("Stock quantity cannot be negative")
+    return values
+
+
 def import_phones_from_csv(file):
     created = []
     errors = []
@@ -21,46 +69,249 @@ def import_phones_from_csv(file):
             content = content.decode('utf-8')
         
         csv_reader = csv.DictReader(StringIO(content))
+        parsed = []
         
         for row_num, row in enumerate(csv_reader, start=2):
             try:
-                required_fields = ['brand', 'model_name', 'condition', 'base_price']
-                for field in required_fields:
-                    if not row.get(field, '').strip():
-                        raise ValueError(f"Missing required field: {field}")
-                
-                phone = Phone(
-                    brand=sanitize_string(row['brand'].strip()),
-                    model_name=sanitize_string(row['model_name'].strip()),
-                    condition=sanitize_string(row['condition'].strip()),
-                    storage=sanitize_string(row.get('storage', '').strip()),
-                    color=sanitize_string(row.get('color', '').strip()),
-                    base_price=float(row['base_price']),
-                    stock_quantity=int(row.get('stock_quantity', 0)),
-                    discontinued=str(row.get('discontinued', 'false')).lower() in ['true', '1', 'yes'],
-                    tags=sanitize_string(row.get('tags', '').strip())
-                )
-                
-                if phone.base_price <= 0:
-                    raise ValueError("Base price must be greater than 0")
-                if phone.stock_quantity < 0:
-                    raise ValueError("Stock quantity cannot be negative")
-                
-                db.session.add(phone)
-                created.append(phone)
+                parsed.append((row_num, parse_phone_row(row)))
                 
             except (ValueError, TypeError) as e:
                 errors.append(f"Row {row_num}: {str(e)}")
             except Exception as e:
                 errors.append(f"Row {row_num}: Unexpected error - {str(e)}")
         
+        taken = existing_skus(sku_key(values) for _, values in parsed)
+        for row_num, values in parsed:
+            key = sku_key(values)
+            if key in taken:
+                errors.append(f"Row {row_num}: {DUPLICATE_SKU_ERROR}")
+                continue
+            taken.add(key)
+            phone = Phone(**values)
+            db.session.add(phone)
+            created.append(phone)
+        
         if not errors:
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # another writer added one of these phones since the check above
+                db.session.rollback()
+                errors.append(f"{DUPLICATE_SKU_ERROR} (added while importing)")
         else:
             db.session.rollback()
             
     except Exception as e:
         db.session.rollback()
+        created = []
         errors.append(f"File processing error: {str(e)}")
     
-    return created, errors
\ No newline at end of file
+    return created, errors
+
+
+def iter_csv_rows(file):
+    stream = getattr(file, 'stream', file)
+    first = stream.readline()
+    if isinstance(first, bytes):
+        lines = codecs.iterdecode(itertools.chain([first], stream), 'utf-8-sig')
+    else:
+        lines = itertools.chain([first], stream)
+    return csv.DictReader(lines)
+
+
+def sku_key(values):
+    return tuple(values[f] for f in SKU_FIELDS)
+
+
+def existing_skus(keys):
+    key_cols = [getattr(Phone, f) for f in SKU_FIELDS]
+    keys = list(set(keys))
+    found = set()
+    for start in range(0, len(keys), DEFAULT_BATCH_SIZE):
+        found.update(tuple(row) for row in db.session.query(*key_cols)
+                     .filter(tuple_(*key_cols).in_(keys[start:start + DEFAULT_BATCH_SIZE])))
+    return found
+
+
+def insert_phone_batch(batch):
+    # returns the counts and the positions of rows skipped as duplicates, of a phone
+    # already stored or of an earlier row in the batch
+    taken = existing_skus(sku_key(values) for values in batch)
+    rows = []
+    duplicates = []
+    for i, values in enumerate(batch):
+        key = sku_key(values)
+        if key in taken:
+            duplicates.append(i)
+        else:
+            taken.add(key)
+            rows.append((i, values))
+    if not rows:
+        return (0, 0, 0), duplicates
+
+    bind = db.session.get_bind()
+    if bind.dialect.name not in DIALECT_INSERTS:
+        db.session.execute(Phone.__table__.insert(), [values for _, values in rows])
+        return (len(rows), 0, 0), duplicates
+    # another worker may be importing the same phones
+    key_cols = [Phone.__table__.c[f] for f in SKU_FIELDS]
+    insert = dialect_insert(bind, Phone.__table__).on_conflict_do_nothing().returning(*key_cols)
+    inserted = {tuple(row) for row in db.session.execute(insert, [values for _, values in rows])}
+    duplicates.extend(i for i, values in rows if sku_key(values) not in inserted)
+    duplicates.sort()
+    return (len(inserted), 0, 0), duplicates
+
+
+def upsert_phone_batch(batch):
+    rows = {}
+    for values in batch:
+        rows[sku_key(values)] = values
+
+    key_cols = [getattr(Phone, f) for f in SKU_FIELDS]
+    existing = db.session.query(Phone.id, *key_cols, *[getattr(Phone, f) for f in UPSERT_FIELDS]) \
+        .filter(tuple_(*key_cols).in_(list(rows))).all()
+
+    changes = []
+    for match in existing:
+        key = tuple(match[1:1 + len(SKU_FIELDS)])
+        values = rows.pop(key, None)
+        if values is None:
+            continue
+        current = match[1 + len(SKU_FIELDS):]
+        if all(values[f] == old for f, old in zip(UPSERT_FIELDS, current)):
+            continue
+        change = {f"new_{f}": values[f] for f in UPSERT_FIELDS}
+        change['_id'] = match.id
+        changes.append(change)
+
+    if rows:
+        db.session.execute(Phone.__table__.insert(), list(rows.values()))
+    if changes:
+        stmt = update(Phone.__table__).where(Phone.__table__.c.id == bindparam('_id')) \
+            .values({f: bindparam(f"new_{f}") for f in UPSERT_FIELDS})
+        db.session.execute(stmt, changes)
+    # rows superseded by a later duplicate in the same batch count as unchanged
+    return (len(rows), len(changes), len(batch) - len(rows) - len(changes)), []
+
+
+def stream_import_phones_from_csv(file, batch_size=DEFAULT_BATCH_SIZE, atomic=False,
+                                  progress=None, max_errors=MAX_REPORTED_ERRORS, upsert=False):
+    write_batch = upsert_phone_batch if upsert else insert_phone_batch
+    result = {
+        'created_count': 0,
+        'error_count': 0,
+        'rows_processed': 0,
+        'batches': 0,
+        'errors': [],
+    }
+    if upsert:
+        result['updated_count'] = 0
+        result['unchanged_count'] = 0
+    staged = [0, 0, 0]
+
+    def add_error(message):
+        result['error_count'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append(message)
+
+    def publish():
+        result['created_count'] = staged[0]
+        if upsert:
+            result['updated_count'] = staged[1]
+            result['unchanged_count'] = staged[2]
+
+    def flush(batch, row_nums):
+        counts, duplicates = write_batch(batch)
+        for i, n in enumerate(counts):
+            staged[i] += n
+        for i in duplicates:
+            add_error(f"Row {row_nums[i]}: {DUPLICATE_SKU_ERROR}")
+        if not atomic:
+            db.session.commit()
+            publish()
+        result['batches'] += 1
+        if progress:
+            progress({
+                'batch': result['batches'],
+                'batch_rows': len(batch),
+                'rows_processed': result['rows_processed'],
+                'inserted_count': staged[0],
+                'updated_count': staged[1],
+                'error_count': result['error_count'],
+            })
+
+    try:
+        batch = []
+        row_nums = []
+        for row_num, row in enumerate(iter_csv_rows(file), start=2):
+            result['rows_processed'] += 1
+            try:
+                batch.append(parse_phone_row(row))
+                row_nums.append(row_num)
+            except (ValueError, TypeError) as e:
+                add_error(f"Row {row_num}: {str(e)}")
+            except Exception as e:
+                add_error(f"Row {row_num}: Unexpected error - {str(e)}")
+
+            if len(batch) >= batch_size:
+                # an atomic import is already doomed, keep validating but stop writing
+                if not (atomic and result['error_count']):
+                    flush(batch, row_nums)
+                batch = []
+                row_nums = []
+
+        if batch and not (atomic and result['error_count']):
+            flush(batch, row_nums)
+
+        if atomic:
+            if result['error_count']:
+                db.session.rollback()
+            else:
+                db.session.commit()
+                publish()
+
+    except Exception as e:
+        db.session.rollback()
+        add_error(f"File processing error: {str(e)}")
+
+    return result
+
+
+def run_import(file, mode=None, batch_size=DEFAULT_BATCH_SIZE, atomic=False, progress=None):
+    started = get_ist_now()
+    if mode not in ('stream', 'upsert'):
+        created, errors = import_phones_from_csv(file)
+        # a failing legacy import is rolled back as a whole
+        created_count = 0 if errors else len(created)
+        result = {'created_count': created_count, 'error_count': len(errors), 'errors': errors}
+    else:
+        result = stream_import_phones_from_csv(file, batch_size=batch_size, atomic=atomic,
+                                               progress=progress, upsert=mode == 'upsert')
+
+    if result['created_count'] or result.get('updated_count'):
+        refresh_stale_prices(since=started)
+        db.session.commit()
+    return result
+
+
+def import_phones_job(progress, path, **options):
+    def report(p):
+        progress({
+            'processed': p['rows_processed'],
+            'succeeded': p['inserted_count'] + p['updated_count'],
+            'failed': p['error_count'],
+        })
+
+    try:
+        with open(path, 'rb') as f:
+            result = run_import(f, progress=report, **options)
+    finally:
+        os.remove(path)
+
+    written = result['created_count'] + result.get('updated_count', 0)
+    progress({
+        'processed': result.get('rows_processed', written + result['error_count']),
+        'succeeded': written,
+        'failed': result['error_count'],
+    })
+    return result
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Link } from "react-router-dom";
 import axios from "axios";
 
@@ -8,17 +8,61 @@ function Admin() {
   const [showBulkModal, setShowBulkModal] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
   const [priceOverrides, setPriceOverrides] = useState({});
+  const changeSeq = useRef(0);
 
   useEffect(() => {
     fetchPhones();
   }, []);
 
+  const applyChanges = (current, changes) => {
+    const byId = new Map(current.map((p) => [p.id, p]));
+    for (const change of changes) {
+      if (change.op === "delete") {
+        byId.delete(change.id);
+      } else {
+        byId.set(change.id, change.phone);
+      }
+    }
+    return [...byId.values()].sort((a, b) => a.id - b.id);
+  };
+
+  const fetchAllPhones = async () => {
+    const response = await axios.get("/api/phones");
+    setPhones(response.data);
+  };
+
+  // pulls only what changed since the last sync; the first call loads everything
   const fetchPhones = async () => {
     try {
-      const response = await axios.get("/api/phones");
-      setPhones(response.data);
+      if (changeSeq.current === null) {
+        await fetchAllPhones();
+        return;
+      }
+      let changes = [];
+      let since = changeSeq.current;
+      let hasMore = true;
+      while (hasMore) {
+        const response = await axios.get("/api/phones/changes", {
+          params: { since, limit: 5000 },
+        });
+        changes = changes.concat(response.data.changes);
+        since = response.data.next_since;
+        hasMore = response.data.has_more;
+      }
+      setPhones((current) => applyChanges(current, changes));
+      changeSeq.current = since;
     } catch (error) {
-      console.error("Error fetching phones:", error);
+      if (error.response?.status === 501) {
+        // the server runs without a change feed: reload the full list from now on
+        changeSeq.current = null;
+        try {
+          await fetchAllPhones();
+        } catch (fallbackError) {
+          console.error("Error fetching phones:", fallbackError);
+        }
+      } else {
+        console.error("Error fetching phones:", error);
+      }
     } finally {
       setLoading(false);
     }
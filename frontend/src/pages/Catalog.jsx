@@ -2,24 +2,9 @@ import { useState, useEffect } from "react";
 import { useSearchParams } from "react-router-dom";
 import axios from "axios";
 
-function PlatformPrice({ phoneId, platform, basePrice }) {
-  const [priceData, setPriceData] = useState(null);
-
-  useEffect(() => {
-    const fetchPrice = async () => {
-      try {
-        const response = await axios.get(
-          `/api/phones/${phoneId}/price/${platform}`
-        );
-        setPriceData(response.data);
-      } catch (error) {
-        console.error(`Error fetching price for platform ${platform}:`, error);
-      }
-    };
-    fetchPrice();
-  }, [phoneId, platform]);
-
+function PlatformPrice({ priceData }) {
   if (!priceData) return <span className="text-gray-400">Loading...</span>;
+  if (priceData.error) return <span className="text-gray-400">N/A</span>;
 
   return (
     <span
@@ -33,34 +18,74 @@ function PlatformPrice({ phoneId, platform, basePrice }) {
   );
 }
 
+const FACET_PARAMS = [
+  "q",
+  "condition",
+  "brand",
+  "storage",
+  "color",
+  "min_price",
+  "max_price",
+  "in_stock",
+];
+const PAGE_SIZE = 100;
+
+function FacetSelect({ name, label, facet, value }) {
+  return (
+    <select
+      name={name}
+      className="border rounded px-3 py-2"
+      defaultValue={value}
+      key={value}
+    >
+      <option value="">All {label}</option>
+      {(facet || []).map((f) => (
+        <option key={f.value} value={f.value}>
+          {f.value} ({f.count})
+        </option>
+      ))}
+    </select>
+  );
+}
+
 function Catalog() {
   const [phones, setPhones] = useState([]);
+  const [facets, setFacets] = useState({});
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [prices, setPrices] = useState({});
   const [loading, setLoading] = useState(true);
   const [searchParams, setSearchParams] = useSearchParams();
 
   const query = searchParams.get("q") || "";
   const condition = searchParams.get("condition") || "";
   const platform = searchParams.get("platform") || "";
-
-  const conditions = [
-    "New",
-    "Excellent",
-    "Good",
-    "Fair",
-    "As New",
-    "Usable",
-    "Scrap",
-  ];
   const platforms = ["X", "Y", "Z"];
 
+  const filterQuery = FACET_PARAMS.filter((p) => searchParams.get(p))
+    .map((p) => `${p}=${encodeURIComponent(searchParams.get(p))}`)
+    .join("&");
+
   useEffect(() => {
     fetchPhones();
-  }, []);
+  }, [filterQuery]);
 
-  const fetchPhones = async () => {
+  // filtering and facet counts happen on the server, one page at a time
+  const fetchPhones = async (cursor = null) => {
     try {
-      const response = await axios.get("/api/phones");
-      setPhones(response.data);
+      const params = `limit=${PAGE_SIZE}${filterQuery ? `&${filterQuery}` : ""}`;
+      const response = await axios.get(
+        cursor
+          ? `/api/phones?${params}&cursor=${cursor}`
+          : `/api/phones?${params}&facets=1`
+      );
+      const page = response.data;
+      setPhones((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.next_cursor);
+      if (!cursor) {
+        setFacets(page.facets);
+        setTotal(page.total);
+      }
     } catch (error) {
       console.error("Error fetching phones:", error);
     } finally {
@@ -68,29 +93,33 @@ function Catalog() {
     }
   };
 
-  const filteredPhones = phones.filter((phone) => {
-    const matchesQuery =
-      !query ||
-      phone.model_name.toLowerCase().includes(query.toLowerCase()) ||
-      phone.brand.toLowerCase().includes(query.toLowerCase());
-
-    const matchesCondition = !condition || phone.condition === condition;
+  const visibleIds = phones.map((phone) => phone.id).join(",");
 
-    return matchesQuery && matchesCondition;
-  });
+  useEffect(() => {
+    if (!visibleIds) return;
+    const fetchPrices = async () => {
+      try {
+        const response = await axios.post("/api/prices/bulk", {
+          ids: visibleIds.split(",").map(Number),
+          platforms,
+        });
+        setPrices(response.data.prices);
+      } catch (error) {
+        console.error("Error fetching prices:", error);
+      }
+    };
+    fetchPrices();
+  }, [visibleIds]);
 
   const handleSearch = (e) => {
     e.preventDefault();
     const formData = new FormData(e.target);
     const newParams = new URLSearchParams();
 
-    const q = formData.get("q");
-    const cond = formData.get("condition");
-    const plat = formData.get("platform");
-
-    if (q) newParams.set("q", q);
-    if (cond) newParams.set("condition", cond);
-    if (plat) newParams.set("platform", plat);
+    for (const name of [...FACET_PARAMS, "platform"]) {
+      const value = formData.get(name);
+      if (value) newParams.set(name, value);
+    }
 
     setSearchParams(newParams);
   };
@@ -102,10 +131,11 @@ function Catalog() {
   return (
     <div>
       <h2 className="text-2xl font-bold mb-6">Catalog</h2>
+      <p className="text-sm text-gray-500 mb-4">{total} phones</p>
 
       <form
         onSubmit={handleSearch}
-        className="grid grid-cols-1 md:grid-cols-5 gap-4 mb-6"
+        className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-6"
       >
         <input
           name="q"
@@ -114,18 +144,61 @@ function Catalog() {
           defaultValue={query}
         />
 
-        <select
+        <FacetSelect
           name="condition"
+          label="conditions"
+          facet={facets.condition}
+          value={condition}
+        />
+
+        <FacetSelect
+          name="brand"
+          label="brands"
+          facet={facets.brand}
+          value={searchParams.get("brand") || ""}
+        />
+
+        <FacetSelect
+          name="storage"
+          label="storage"
+          facet={facets.storage}
+          value={searchParams.get("storage") || ""}
+        />
+
+        <FacetSelect
+          name="color"
+          label="colors"
+          facet={facets.color}
+          value={searchParams.get("color") || ""}
+        />
+
+        <input
+          name="min_price"
+          type="number"
+          min="0"
           className="border rounded px-3 py-2"
-          defaultValue={condition}
-        >
-          <option value="">All conditions</option>
-          {conditions.map((c) => (
-            <option key={c} value={c}>
-              {c}
-            </option>
-          ))}
-        </select>
+          placeholder="Min price"
+          defaultValue={searchParams.get("min_price") || ""}
+        />
+
+        <input
+          name="max_price"
+          type="number"
+          min="0"
+          className="border rounded px-3 py-2"
+          placeholder="Max price"
+          defaultValue={searchParams.get("max_price") || ""}
+        />
+
+        <label className="flex items-center gap-2">
+          <input
+            name="in_stock"
+            type="checkbox"
+            value="1"
+            defaultChecked={searchParams.get("in_stock") === "1"}
+          />
+          In stock only
+        </label>
 
         <select
           name="platform"
@@ -176,8 +249,8 @@ function Catalog() {
             </tr>
           </thead>
           <tbody className="divide-y divide-gray-200">
-            {filteredPhones.length > 0 ? (
-              filteredPhones.map((phone) => (
+            {phones.length > 0 ? (
+              phones.map((phone) => (
                 <tr key={phone.id}>
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                     {phone.id}
@@ -202,11 +275,7 @@ function Catalog() {
                       {platforms.map((p) => (
                         <div key={p} className="text-xs">
                           <span className="font-medium">{p}:</span>
-                          <PlatformPrice
-                            phoneId={phone.id}
-                            platform={p}
-                            basePrice={phone.base_price}
-                          />
+                          <PlatformPrice priceData={prices[phone.id]?.[p]} />
                         </div>
                       ))}
                     </div>
@@ -223,6 +292,15 @@ function Catalog() {
           </tbody>
         </table>
       </div>
+
+      {nextCursor && (
+        <button
+          onClick={() => fetchPhones(nextCursor)}
+          className="mt-4 bg-gray-100 px-4 py-2 rounded hover:bg-gray-200"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 }